@@ -0,0 +1,126 @@
+import math, threading, time
+from collections import OrderedDict
+from metrics import registry
+
+
+# =========================
+# 🚦 /chat 입장 제어 (동시 처리 수 제한 · 사용자별 속도 제한)
+# =========================
+# LLM 응답을 기다리는 /chat 요청이 한꺼번에 몰리면 gunicorn 대기열에서 끝없이 쌓였다가
+# 모두 타임아웃된다. 그래서 LLM 단계에 들어가는 요청 수를 제한하고, 자리가 날 때까지
+# 정해진 수만큼만 잠깐 기다리게 하고, 그 이상은 Retry-After와 함께 바로 돌려보낸다.
+# 상태는 워커 프로세스마다 따로 가진다 (회로 차단기와 같음).
+
+admission_wait = registry.histogram(
+    "kirri_admission_wait_seconds", "LLM 단계 자리를 기다린 시간(초)", ("route",)
+)
+admission_active = registry.gauge("kirri_admission_active", "LLM 단계를 처리 중인 요청 수")
+admission_queued = registry.gauge("kirri_admission_queued", "LLM 단계 자리를 기다리는 요청 수")
+admission_rejected = registry.counter(
+    "kirri_admission_rejected_total", "입장 제어로 거절한 요청 수", ("reason",)
+)
+
+
+class Rejected(Exception):
+    """status와 retry_after(초)를 담아서 라우트가 429/503 응답을 만들 수 있게 한다"""
+
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class Slot:
+    """LLM 단계 자리 하나. release()는 여러 번 불러도 한 번만 반납한다"""
+
+    def __init__(self, limiter):
+        self._limiter = limiter
+        self._acquired_at = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._limiter._release(time.monotonic() - self._acquired_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class ConcurrencyLimiter:
+    """동시에 max_active개까지 처리, 넘치면 max_queue개까지 queue_timeout초 기다림, 그 이상은 503"""
+
+    def __init__(self, max_active=50, max_queue=100, queue_timeout=10.0):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._queued = 0
+        self._avg_hold = 2.0  # 자리 하나를 쥐고 있는 평균 시간(초), Retry-After 추정용
+        self._cond = threading.Condition()
+
+    def acquire(self, route=""):
+        start = time.monotonic()
+        with self._cond:
+            if self._active >= self.max_active:
+                if self._queued >= self.max_queue:
+                    admission_rejected.inc(reason="queue_full")
+                    raise Rejected(503, "queue_full", self._retry_after())
+                self._queued += 1
+                admission_queued.set(self._queued)
+                try:
+                    give_up_at = start + self.queue_timeout
+                    while self._active >= self.max_active:
+                        remaining = give_up_at - time.monotonic()
+                        if remaining <= 0:
+                            admission_rejected.inc(reason="queue_timeout")
+                            raise Rejected(503, "queue_timeout", self._retry_after())
+                        self._cond.wait(remaining)
+                finally:
+                    self._queued -= 1
+                    admission_queued.set(self._queued)
+            self._active += 1
+            admission_active.set(self._active)
+        admission_wait.observe(time.monotonic() - start, route=route)
+        return Slot(self)
+
+    def _release(self, held):
+        with self._cond:
+            self._active -= 1
+            self._avg_hold = 0.9 * self._avg_hold + 0.1 * held
+            admission_active.set(self._active)
+            self._cond.notify()
+
+    def _retry_after(self):
+        # 앞에 기다리는 요청이 모두 빠질 때까지 걸릴 대략적인 시간
+        return self._avg_hold * (self._queued + 1) / self.max_active
+
+
+class TokenBucket:
+    """사용자별 토큰 버킷: 분당 rate_per_minute개씩 채워지고 최대 burst개까지 모인다"""
+
+    def __init__(self, rate_per_minute=20, burst=5, max_users=10000):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_users = max_users
+        self._buckets = OrderedDict()  # user_id → (남은 토큰, 마지막 갱신 시각)
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                admission_rejected.inc(reason="rate_limited")
+                raise Rejected(429, "rate_limited", (1 - tokens) / self.rate)
+            self._buckets[key] = (tokens - 1, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
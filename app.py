@@ -7,6 +7,8 @@ from flask import (
     flash,
     jsonify,
     session,
+    Response,
+    stream_with_context,
 )
 from flask_login import (
     LoginManager,
@@ -17,15 +19,24 @@ from flask_login import (
     current_user,
 )
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import timedelta, datetime
+from sqlalchemy.orm import make_transient_to_detached
+from datetime import date, timedelta, datetime, timezone
 from flask_cors import CORS
-import random, os
-import matplotlib
-
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+import random, os, json, zlib, csv, io, time
 from dotenv import load_dotenv
+from state_store import MemoryStateStore, create_state_store
+from mood import kst_date, score_message, score_messages, score_to_level
+from chatlog_writer import ChatLogWriter
+from periodic import PeriodicJob
+from db_profile import engine_options, normalize_database_url, write_lock
+from assets import asset_url, build_assets, send_hashed_asset
+from password_hashing import HasherBusy, password_hasher
+from admission import ConcurrencyLimiter, Rejected, TokenBucket
+from idempotency import IdempotentRequests, request_key
+from search_index import bigrams, query_grams, query_terms, score as search_score
+import metrics
+from metrics import span
+import click
 
 load_dotenv()
 
@@ -44,6 +55,9 @@ app.config.update(
     PERMANENT_SESSION_LIFETIME=timedelta(hours=1),
 )
 
+# 템플릿에서 {{ asset_url("mascot/mascot00.png", "thumb") }} 처럼 빌드된 이미지 주소를 쓴다
+app.jinja_env.globals["asset_url"] = asset_url
+
 # CORS 설정
 CORS(
     app,
@@ -58,9 +72,10 @@ CORS(
     supports_credentials=True,
 )
 
-# DB 설정
-app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL", "sqlite:///users.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"pool_pre_ping": True}
+# DB 설정 (SQLite PRAGMA · 연결 풀 크기는 db_profile.py)
+database_url = normalize_database_url(os.getenv("DATABASE_URL", "sqlite:///users.db"))
+app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_url)
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 db = SQLAlchemy(app)
 
@@ -69,30 +84,720 @@ login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = "login"
 
+# 계측: 라우트/단계별 시간, 오류 수, DB 쿼리 수 (/metrics)
+metrics.init_app(app)
+
 
 # 모델 정의
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=False)
-    password = db.Column(db.String(150), nullable=False)
+    password = db.Column(db.String(255), nullable=False)  # scrypt 해시는 150자를 넘는다
     mascot = db.Column(db.String(50), default="mascot00.png")
+    # /reset 시각. 이 시각 이전 대화는 숨기고, 실제 삭제는 compact-chatlogs가 나중에 한다
+    history_reset_at = db.Column(db.DateTime)
 
 
 class ChatLog(db.Model):
+    # 사용자별 대화 기록을 시간순으로 훑는 쿼리(히스토리 페이지, 리포트)용 복합 인덱스
+    __table_args__ = (db.Index("ix_chat_log_user_id_timestamp", "user_id", "timestamp"),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
     role = db.Column(db.String(10))
     message = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    mood_score = db.Column(db.Integer)  # user 메시지의 감정 점수 (저장할 때 한 번만 계산)
+
+
+class MoodDaily(db.Model):
+    """사용자별 · KST 일자별 감정 점수 합계 (ChatLog 저장과 같은 트랜잭션에서 갱신)"""
+
+    __tablename__ = "mood_daily"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    score = db.Column(db.Integer, nullable=False, default=0)
+    message_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ChatLogArchive(db.Model):
+    """보관 기간이 지난 대화를 사용자 · 월(KST) 단위로 묶어 압축해 둔 세그먼트"""
+
+    __tablename__ = "chat_log_archive"
+    __table_args__ = (db.Index("ix_chat_log_archive_user_id_last_ts", "user_id", "last_ts"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    month = db.Column(db.String(7), nullable=False)  # "YYYY-MM"
+    first_id = db.Column(db.Integer, nullable=False)
+    last_id = db.Column(db.Integer, nullable=False)
+    first_ts = db.Column(db.DateTime, nullable=False)
+    last_ts = db.Column(db.DateTime, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False)
+    # zlib(JSON [[id, role, message, timestamp, mood_score], ...]) (시간순)
+    payload = db.Column(db.LargeBinary, nullable=False)
+
+
+class ChatSearchGram(db.Model):
+    """대화 검색용 역색인: (사용자, 글자 바이그램) → 메시지 id (search_index.py)"""
+
+    __tablename__ = "chat_search_gram"
+    # 기본키 순서 그대로 B-tree에 저장(WITHOUT ROWID)해서 (사용자, 바이그램) 범위를 바로 읽는다
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    gram = db.Column(db.String(2), primary_key=True)
+    log_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+
+def encode_segment(rows):
+    return zlib.compress(
+        json.dumps(
+            [[r["id"], r["role"], r["message"], r["timestamp"].isoformat(), r["mood_score"]] for r in rows],
+            ensure_ascii=False,
+        ).encode()
+    )
 
 
-with app.app_context():
+def decode_segment(segment):
+    return [
+        {
+            "id": log_id,
+            "role": role,
+            "message": message,
+            "timestamp": datetime.fromisoformat(timestamp),
+            "mood_score": mood_score,
+        }
+        for log_id, role, message, timestamp, mood_score in json.loads(zlib.decompress(segment.payload))
+    ]
+
+
+def add_missing_columns():
+    """create_all은 기존 테이블을 바꾸지 않으므로, 모델에 새로 생긴 컬럼을 ALTER TABLE로 추가
+    (길이가 늘어난 문자열 컬럼은 넓힌다)"""
+    inspector = db.inspect(db.engine)
+    dialect = db.engine.dialect.name
+    quote = db.engine.dialect.identifier_preparer.quote
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {col["name"]: col for col in inspector.get_columns(table.name)}
+        table_name = quote(table.name)  # PostgreSQL에서 user는 예약어
+        for column in table.columns:
+            col_type = column.type.compile(dialect=db.engine.dialect)
+            if column.name not in existing:
+                db.session.execute(
+                    db.text(f"ALTER TABLE {table_name} ADD COLUMN {quote(column.name)} {col_type}")
+                )
+            elif widened(existing[column.name]["type"], column.type) and dialect != "sqlite":
+                # SQLite는 VARCHAR 길이를 검사하지 않으므로 그 외 DB에서만 넓힌다
+                db.session.execute(
+                    db.text(
+                        f"ALTER TABLE {table_name} ALTER COLUMN {quote(column.name)} TYPE {col_type}"
+                    )
+                )
+    db.session.commit()
+
+
+def widened(old_type, new_type):
+    """모델의 문자열 컬럼 길이가 DB에 있는 것보다 늘어났는지"""
+    old_length = getattr(old_type, "length", None)
+    new_length = getattr(new_type, "length", None)
+    return old_length is not None and new_length is not None and new_length > old_length
+
+
+def init_db():
+    """스키마 생성/보강. import 시점이 아니라 배포 시작 단계에서 한 번 실행한다"""
     db.create_all()
+    add_missing_columns()
+    # create_all은 이미 있는 테이블에 새 인덱스를 추가하지 않으므로 따로 확인해서 생성
+    for index in ChatLog.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+
+# 스키마 초기화: flask --app app init-db
+@app.cli.command("init-db")
+def init_db_command():
+    """테이블 · 컬럼 · 인덱스를 만든다 (이미 있으면 건너뜀)"""
+    init_db()
+    click.echo("DB 초기화 완료")
+
+
+# 대화 저장 (모든 ChatLog 쓰기는 여기를 거친다)
+def upsert_mood_daily(user_id, day, score, count):
+    dialect = db.engine.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+
+        table = MoodDaily.__table__
+        stmt = insert(table).values(
+            user_id=user_id, day=day, score=score, message_count=count
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "day"],
+            set_={
+                "score": table.c.score + stmt.excluded.score,
+                "message_count": table.c.message_count + stmt.excluded.message_count,
+            },
+        )
+        db.session.execute(stmt)
+        return
+
+    row = db.session.get(MoodDaily, (user_id, day))
+    if row is None:
+        db.session.add(MoodDaily(user_id=user_id, day=day, score=score, message_count=count))
+    else:
+        row.score += score
+        row.message_count += count
+
+
+# =========================
+# 🔎 대화 검색 색인
+# =========================
+# ChatLog를 저장하는 트랜잭션 안에서 바이그램을 같이 넣는다. 보관 세그먼트로 옮긴 대화도
+# 색인은 남겨 두고, /reset으로 숨긴 대화를 실제로 지울 때만 함께 지운다.
+# 색인 도입 전 대화는 한 번 flask --app app reindex-search 로 채운다.
+
+
+def search_postings(logs):
+    """(log_id, user_id, message) 목록 → 색인 행 목록"""
+    return [
+        {"user_id": user_id, "gram": gram, "log_id": log_id}
+        for log_id, user_id, message in logs
+        for gram in bigrams(message)
+    ]
+
+
+def index_logs(logs, skip_existing=False):
+    rows = search_postings(logs)
+    if not rows:
+        return
+    stmt = db.insert(ChatSearchGram)
+    if skip_existing:
+        # 재색인 도중 새로 저장된 대화는 이미 색인되어 있을 수 있다
+        dialect = db.engine.dialect.name
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        elif dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            insert = None
+        if insert is not None:
+            stmt = insert(ChatSearchGram).on_conflict_do_nothing()
+    db.session.execute(stmt, rows)
+
+
+def unindex_logs(logs):
+    rows = [
+        {"b_user_id": row["user_id"], "b_gram": row["gram"], "b_log_id": row["log_id"]}
+        for row in search_postings(logs)
+    ]
+    if not rows:
+        return
+    table = ChatSearchGram.__table__
+    db.session.execute(
+        table.delete().where(
+            table.c.user_id == db.bindparam("b_user_id"),
+            table.c.gram == db.bindparam("b_gram"),
+            table.c.log_id == db.bindparam("b_log_id"),
+        ),
+        rows,
+    )
+
+
+def write_chat_logs(batch):
+    """[(user_id, timestamp, [(role, message), ...]), ...]를 한 트랜잭션으로 저장하고
+    user 메시지의 감정 점수를 일별 집계에 반영"""
+    with write_lock(database_url):
+        _write_chat_logs(batch)
+    for user_id in {user_id for user_id, _, _ in batch}:
+        invalidate_report_cache(user_id)
+
+
+def _write_chat_logs(batch):
+    rollup = {}  # (user_id, KST 날짜) → (점수 합, 메시지 수)
+    logs = []
+    for user_id, timestamp, entries in batch:
+        for role, message in entries:
+            mood_score = score_message(message) if role == "user" else None
+            log = ChatLog(
+                user_id=user_id,
+                role=role,
+                message=message,
+                timestamp=timestamp,
+                mood_score=mood_score,
+            )
+            db.session.add(log)
+            logs.append(log)
+            if mood_score is not None:
+                key = (user_id, kst_date(timestamp))
+                score, count = rollup.get(key, (0, 0))
+                rollup[key] = (score + mood_score, count + 1)
+
+    for (user_id, day), (score, count) in rollup.items():
+        upsert_mood_daily(user_id, day, score, count)
+    db.session.flush()  # 색인에 넣을 id 받기
+    index_logs([(log.id, log.user_id, log.message) for log in logs])
+    with span("chatlog_commit"):
+        db.session.commit()
+
+
+# 지연 쓰기: CHATLOG_WRITE_BEHIND=1이면 저장을 큐에 넣고 바로 응답한다
+# 큐는 워커마다 따로라서 방금 보낸 대화가 바로 보이는 건 같은 워커 안에서만이다. 기본 배포는
+# 워커 2개라 다른 워커로 간 /history 등에는 CHATLOG_FLUSH_INTERVAL_MS만큼 늦게 보일 수 있다
+chatlog_writer = None
+if os.getenv("CHATLOG_WRITE_BEHIND") == "1":
+
+    def _flush_chat_logs(batch):
+        with app.app_context():
+            write_chat_logs([(user_id, *item) for user_id, item in batch])
+
+    chatlog_writer = ChatLogWriter(
+        _flush_chat_logs,
+        interval=int(os.getenv("CHATLOG_FLUSH_INTERVAL_MS", "50")) / 1000,
+        max_batch=int(os.getenv("CHATLOG_FLUSH_BATCH", "100")),
+        max_retries=int(os.getenv("CHATLOG_FLUSH_MAX_RETRIES", "5")),
+    )
+
+
+def save_chat_logs(user_id, entries):
+    """[(role, message), ...]를 저장 (지연 쓰기가 켜져 있으면 큐에 넣기만 함)"""
+    timestamp = datetime.utcnow()
+    with span("chatlog_save"):
+        if chatlog_writer is not None:
+            chatlog_writer.submit(user_id, (timestamp, entries))
+            return
+        write_chat_logs([(user_id, timestamp, entries)])
+
+
+def sync_chat_logs(user_id):
+    """이 사용자의 기록을 읽기 전에 큐에 남은 쓰기를 먼저 반영"""
+    if chatlog_writer is not None:
+        chatlog_writer.sync(user_id)
+
+
+def get_daily_mood(user_id, days):
+    """최근 days일(KST, 오늘 포함)의 {날짜: 점수}. mood_daily 인덱스 범위 조회 한 번으로 끝난다"""
+    today = kst_date(datetime.utcnow())
+    start = today - timedelta(days=days - 1)
+    daily_score = {start + timedelta(days=i): 0 for i in range(days)}
+
+    rows = MoodDaily.query.filter(
+        MoodDaily.user_id == user_id, MoodDaily.day >= start, MoodDaily.day <= today
+    ).all()
+    for row in rows:
+        daily_score[row.day] = row.score
+    return daily_score
+
+
+def not_reset():
+    """배치 쿼리용 조건: User와 조인한 ChatLog 중 /reset 이후 대화만"""
+    return db.or_(User.history_reset_at.is_(None), ChatLog.timestamp > User.history_reset_at)
+
+
+# 이미지 빌드: flask --app app build-assets (배포 빌드 단계에서 실행)
+@app.cli.command("build-assets")
+def build_assets_command():
+    """static 이미지의 썸네일 · WebP 변형과 manifest.json을 만든다 (바뀐 것만)"""
+    manifest, built = build_assets(app.static_folder)
+    click.echo(f"이미지 {len(manifest)}개 중 {built}개 새로 생성 → static/build/")
+
+
+# 해시 파일명 이미지: 내용이 바뀌면 주소가 바뀌므로 브라우저가 1년 동안 다시 묻지 않는다
+@app.route("/assets/<path:filename>")
+def hashed_asset(filename):
+    return send_hashed_asset(app.static_folder, filename)
+
+
+# 감정 집계 백필: flask --app app backfill-mood
+@app.cli.command("backfill-mood")
+@click.option("--batch-size", default=5000, show_default=True)
+def backfill_mood(batch_size):
+    """기존 ChatLog에 감정 점수를 채우고 mood_daily 집계를 처음부터 다시 만든다"""
+    # 1) 점수가 비어 있는 user 메시지를 id 순으로 잘라가며 채운다
+    last_id, filled = 0, 0
+    while True:
+        rows = (
+            db.session.query(ChatLog.id, ChatLog.message)
+            .filter(
+                ChatLog.id > last_id,
+                ChatLog.role == "user",
+                ChatLog.mood_score.is_(None),
+            )
+            .order_by(ChatLog.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        scores = score_messages([row.message for row in rows])
+        db.session.execute(
+            db.update(ChatLog),
+            [{"id": row.id, "mood_score": score} for row, score in zip(rows, scores)],
+        )
+        db.session.commit()
+        last_id = rows[-1].id
+        filled += len(rows)
+    click.echo(f"mood_score 채움: {filled}건")
+
+    # 2) 일별 집계를 메모리에서 다시 계산해 한 번에 넣는다
+    #    (/reset으로 숨긴 대화는 빼고, 보관 세그먼트도 함께 센다)
+    totals = {}
+
+    def add(user_id, timestamp, mood_score):
+        key = (user_id, kst_date(timestamp))
+        score, count = totals.get(key, (0, 0))
+        totals[key] = (score + (mood_score or 0), count + 1)
+
+    last_id = 0
+    while True:
+        rows = (
+            db.session.query(ChatLog.id, ChatLog.user_id, ChatLog.timestamp, ChatLog.mood_score)
+            .join(User, User.id == ChatLog.user_id)
+            .filter(ChatLog.id > last_id, ChatLog.role == "user", not_reset())
+            .order_by(ChatLog.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        for row in rows:
+            add(row.user_id, row.timestamp, row.mood_score)
+        last_id = rows[-1].id
+
+    reset_at = dict(db.session.query(User.id, User.history_reset_at).all())
+    for segment in ChatLogArchive.query.yield_per(100):
+        floor = reset_at.get(segment.user_id)
+        for row in decode_segment(segment):
+            if row["role"] == "user" and (floor is None or row["timestamp"] > floor):
+                add(segment.user_id, row["timestamp"], row["mood_score"])
+
+    MoodDaily.query.delete()
+    if totals:
+        db.session.execute(
+            db.insert(MoodDaily),
+            [
+                {"user_id": user_id, "day": day, "score": score, "message_count": count}
+                for (user_id, day), (score, count) in totals.items()
+            ],
+        )
+    db.session.commit()
+    click.echo(f"mood_daily 재계산: {len(totals)}일")
+
+
+# 전체 사용자 감정 추이 배치: flask --app app mood-cohort --days 7 --out weekly.csv
+@app.cli.command("mood-cohort")
+@click.option("--days", default=7, show_default=True)
+@click.option("--end", default=None, help="마지막 날짜 (KST, YYYY-MM-DD). 기본값은 오늘")
+@click.option("--out", default="mood_cohort.csv", show_default=True, help=".csv 또는 .parquet")
+@click.option("--chunk-size", default=20000, show_default=True)
+def mood_cohort(days, end, out, chunk_size):
+    """모든 사용자의 일자별 감정 점수 · 6단계 · 코호트 분포를 파일로 저장"""
+    from mood_batch import MoodCohort, write_columns
+
+    end_day = datetime.strptime(end, "%Y-%m-%d").date() if end else kst_date(datetime.utcnow())
+    start_day = end_day - timedelta(days=days - 1)
+    # KST 날짜 경계를 UTC로 바꿔서 (user_id, timestamp) 인덱스 범위로 조회
+    start_utc = datetime.combine(start_day, datetime.min.time()) - timedelta(hours=9)
+    end_utc = datetime.combine(end_day + timedelta(days=1), datetime.min.time()) - timedelta(hours=9)
+
+    usernames = dict(db.session.query(User.id, User.username).all())
+    cohort = MoodCohort(usernames.keys(), start_day, days)
+
+    started = datetime.now()
+    stmt = (
+        db.select(
+            ChatLog.user_id,
+            ChatLog.timestamp,
+            ChatLog.mood_score,
+            # 점수가 이미 있는 행은 본문을 가져오지 않는다
+            db.case((ChatLog.mood_score.is_(None), ChatLog.message), else_=None),
+        )
+        .join(User, User.id == ChatLog.user_id)
+        .where(
+            ChatLog.role == "user",
+            ChatLog.timestamp >= start_utc,
+            ChatLog.timestamp < end_utc,
+            not_reset(),
+        )
+        .execution_options(yield_per=chunk_size)
+    )
+    for rows in db.session.execute(stmt).partitions():
+        cohort.add_chunk(rows)
+
+    # 기간이 보관 세그먼트까지 걸쳐 있으면 그쪽도 읽는다
+    reset_at = dict(db.session.query(User.id, User.history_reset_at).all())
+    segments = ChatLogArchive.query.filter(
+        ChatLogArchive.last_ts >= start_utc, ChatLogArchive.first_ts < end_utc
+    )
+    for segment in segments.yield_per(100):
+        floor = reset_at.get(segment.user_id)
+        cohort.add_chunk(
+            [
+                (segment.user_id, row["timestamp"], row["mood_score"], row["message"])
+                for row in decode_segment(segment)
+                if row["role"] == "user" and (floor is None or row["timestamp"] > floor)
+            ]
+        )
+
+    try:
+        write_columns(out, cohort.columns(usernames))
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    summary = cohort.summary()
+    elapsed = (datetime.now() - started).total_seconds()
+
+    click.echo(
+        f"{start_day} ~ {end_day}: 사용자 {summary['users']}명 (대화 {summary['active_users']}명), "
+        f"메시지 {summary['messages']}건, {elapsed:.2f}초 → {out}"
+    )
+    for name, count in summary["levels"].items():
+        click.echo(f"  {name:<8} {count:>6}명")
+    p = summary["total_score_percentiles"]
+    click.echo(f"  합계 점수 p50 {p[50]:.0f} / p90 {p[90]:.0f} / p99 {p[99]:.0f}")
+    click.echo(
+        "  일자별 평균: "
+        + ", ".join(f"{d[5:]} {m if m is not None else '-'}" for d, m in summary["daily_mean_score"].items())
+    )
+
+
+# 보관(retention): 워커 안에서 주기적으로 실행 (아래 compaction_job). 직접 돌릴 때는 flask --app app compact-chatlogs
+CHATLOG_RETENTION_DAYS = int(os.getenv("CHATLOG_RETENTION_DAYS", "90"))
+ARCHIVE_SEGMENT_MAX_ROWS = 2000
+
+
+def archive_rows(user_id, rows):
+    """시간순 rows를 월(KST)별로 나눠 세그먼트에 넣는다. 같은 달의 마지막 세그먼트에 여유가 있으면 합친다"""
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(kst_date(row["timestamp"]).strftime("%Y-%m"), []).append(row)
+
+    for month, month_rows in by_month.items():
+        last = (
+            ChatLogArchive.query.filter_by(user_id=user_id, month=month)
+            .order_by(ChatLogArchive.last_ts.desc())
+            .first()
+        )
+        if last is not None and last.message_count + len(month_rows) <= ARCHIVE_SEGMENT_MAX_ROWS:
+            month_rows = decode_segment(last) + month_rows
+            db.session.delete(last)
+        for i in range(0, len(month_rows), ARCHIVE_SEGMENT_MAX_ROWS):
+            chunk = month_rows[i : i + ARCHIVE_SEGMENT_MAX_ROWS]
+            db.session.add(
+                ChatLogArchive(
+                    user_id=user_id,
+                    month=month,
+                    first_id=min(r["id"] for r in chunk),
+                    last_id=max(r["id"] for r in chunk),
+                    first_ts=chunk[0]["timestamp"],
+                    last_ts=chunk[-1]["timestamp"],
+                    message_count=len(chunk),
+                    payload=encode_segment(chunk),
+                )
+            )
+
+
+def compact_chat_logs(retention_days=CHATLOG_RETENTION_DAYS, batch_size=5000, echo=print):
+    """/reset으로 숨긴 대화를 실제로 지우고, 오래된 대화를 압축 보관 테이블로 옮긴다"""
+    # 1) 숨긴 대화 삭제: 배치로 잘라서 지워 잠금 시간을 짧게 유지
+    removed = 0
+    resets = db.session.query(User.id, User.history_reset_at).filter(
+        User.history_reset_at.isnot(None)
+    )
+    for user_id, reset_at in resets.all():
+        while True:
+            logs = (
+                db.session.query(ChatLog.id, ChatLog.user_id, ChatLog.message)
+                .filter(ChatLog.user_id == user_id, ChatLog.timestamp <= reset_at)
+                .limit(batch_size)
+                .all()
+            )
+            if not logs:
+                break
+            ids = [log.id for log in logs]
+            unindex_logs(logs)
+            ChatLog.query.filter(ChatLog.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            removed += len(ids)
+            time.sleep(0)  # 워커 안에서 돌 때 배치 사이에 요청 처리에 차례를 넘긴다
+
+        # 기준 시각에 걸친 세그먼트는 남길 행만 다시 보관
+        segments = (
+            ChatLogArchive.query.filter(
+                ChatLogArchive.user_id == user_id, ChatLogArchive.first_ts <= reset_at
+            )
+            .order_by(ChatLogArchive.first_ts)
+            .all()
+        )
+        keep = []
+        for segment in segments:
+            rows = decode_segment(segment)
+            keep += [row for row in rows if row["timestamp"] > reset_at]
+            unindex_logs(
+                [(row["id"], user_id, row["message"]) for row in rows if row["timestamp"] <= reset_at]
+            )
+            removed += len(rows)
+            db.session.delete(segment)
+        db.session.flush()
+        removed -= len(keep)
+        if keep:
+            archive_rows(user_id, keep)
+        db.session.commit()
+    echo(f"숨긴 대화 삭제: {removed}건")
+
+    # 2) 보관: 사용자별로 오래된 순서대로 옮겨서, 보관분이 항상 핫 테이블보다 오래되게 유지
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    user_ids = [
+        user_id
+        for (user_id,) in db.session.query(ChatLog.user_id)
+        .filter(ChatLog.timestamp < cutoff)
+        .distinct()
+    ]
+    archived = 0
+    for user_id in user_ids:
+        while True:
+            logs = (
+                ChatLog.query.filter(ChatLog.user_id == user_id, ChatLog.timestamp < cutoff)
+                .order_by(ChatLog.timestamp, ChatLog.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not logs:
+                break
+            archive_rows(
+                user_id,
+                [
+                    {
+                        "id": log.id,
+                        "role": log.role,
+                        "message": log.message,
+                        "timestamp": log.timestamp,
+                        "mood_score": log.mood_score
+                        if log.mood_score is not None or log.role != "user"
+                        else score_message(log.message or ""),
+                    }
+                    for log in logs
+                ],
+            )
+            ChatLog.query.filter(ChatLog.id.in_([log.id for log in logs])).delete(
+                synchronize_session=False
+            )
+            db.session.commit()
+            archived += len(logs)
+            time.sleep(0)
+    echo(f"보관 세그먼트로 이동: {archived}건 (사용자 {len(user_ids)}명, {cutoff:%Y-%m-%d} 이전)")
+
+
+@app.cli.command("compact-chatlogs")
+@click.option("--retention-days", default=CHATLOG_RETENTION_DAYS, show_default=True)
+@click.option("--batch-size", default=5000, show_default=True)
+def compact_chatlogs(retention_days, batch_size):
+    """/reset으로 숨긴 대화를 실제로 지우고, 오래된 대화를 압축 보관 테이블로 옮긴다"""
+    compact_chat_logs(retention_days, batch_size, echo=click.echo)
+
+
+# 보관 작업 자동 실행: 워커가 첫 요청을 받으면 타이머를 띄우고, 같은 서버의 워커 중
+# 하나만 CHATLOG_COMPACT_INTERVAL_SECONDS마다 compact_chat_logs를 돌린다 (periodic.py)
+#   CHATLOG_COMPACT_INTERVAL_SECONDS  기본 3600. 0이면 끔 — 인스턴스를 여러 대 띄울 때는 끄고
+#                                     flask --app app compact-chatlogs 를 cron 하나로 돌린다
+#   CHATLOG_COMPACT_BATCH_SIZE        워커 안에서 한 번에 지우거나 옮기는 행 수 (기본 1000)
+def _compact_in_background():
+    with app.app_context():
+        compact_chat_logs(batch_size=int(os.getenv("CHATLOG_COMPACT_BATCH_SIZE", "1000")))
+
+
+compaction_job = PeriodicJob(
+    "compact-chatlogs",
+    _compact_in_background,
+    interval=int(os.getenv("CHATLOG_COMPACT_INTERVAL_SECONDS", "3600")),
+    lock_path=os.path.join(app.instance_path, "compact-chatlogs.lock"),
+)
+
+
+@app.before_request
+def start_background_jobs():
+    compaction_job.start()
+
+
+# 검색 색인 다시 만들기: flask --app app reindex-search (색인 도입 후 한 번, 또는 색인이 어긋났을 때)
+@app.cli.command("reindex-search")
+@click.option("--batch-size", default=5000, show_default=True)
+def reindex_search(batch_size):
+    """검색 색인을 비우고 핫 테이블 · 보관 세그먼트의 대화로 다시 채운다"""
+    ChatSearchGram.query.delete()
+    db.session.commit()
+
+    indexed, last_id = 0, 0
+    while True:
+        logs = (
+            db.session.query(ChatLog.id, ChatLog.user_id, ChatLog.message)
+            .filter(ChatLog.id > last_id)
+            .order_by(ChatLog.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not logs:
+            break
+        index_logs(logs, skip_existing=True)
+        db.session.commit()
+        indexed += len(logs)
+        last_id = logs[-1].id
+
+    for segment in ChatLogArchive.query.order_by(ChatLogArchive.id).yield_per(10):
+        rows = [(row["id"], segment.user_id, row["message"]) for row in decode_segment(segment)]
+        index_logs(rows, skip_existing=True)
+        indexed += len(rows)
+    db.session.commit()
+    click.echo(f"검색 색인: {indexed}건")
+
+
+# 로그인 사용자 캐시: @login_required 요청마다 User를 조회하지 않도록 컬럼 값을 잠깐 들고 있는다
+#   USER_CACHE_BACKEND      memory(워커별, 기본) | shared(STATE_BACKEND 저장소를 워커끼리 공유)
+#   USER_CACHE_TTL_SECONDS  기본 60초. memory 모드에서는 다른 워커에서 바뀐 값이 최대 이만큼 늦게 보인다
+# 늦게 보여도 되는 표시용 컬럼만 담는다. 비밀번호 해시는 담지 않고, /reset 기준 시각은
+# 다른 워커에서 지운 대화가 다시 보이면 안 되므로 history_reset_at()이 매번 DB에서 읽는다
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_COLUMNS = ("id", "username", "mascot")
+
+if os.getenv("USER_CACHE_BACKEND", "memory") == "shared":
+    user_cache = create_state_store()
+else:
+    user_cache = MemoryStateStore(
+        max_entries=int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000")), ttl=USER_CACHE_TTL
+    )
+user_cache_lookups = metrics.registry.counter(
+    "kirri_user_cache_total", "load_user 캐시 조회 결과", ("result",)
+)
+
+
+def invalidate_user_cache(user_id):
+    user_cache.delete(f"user:{user_id}")
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    key = f"user:{int(user_id)}"
+    data = user_cache.get(key)
+    if data is not None:
+        user_cache_lookups.inc(result="hit")
+        # 조회 없이 세션에 붙인다 (비밀번호처럼 캐시에 없는 컬럼은 쓸 때 읽어 온다)
+        user = User(**data)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    user_cache_lookups.inc(result="miss")
+    user = db.session.get(User, int(user_id))
+    if user is not None:
+        data = {column: getattr(user, column) for column in USER_CACHE_COLUMNS}
+        user_cache.set(key, data, ttl=USER_CACHE_TTL)
+    return user
+
+
+BUSY_MESSAGE = "지금 로그인하는 친구들이 많아서 잠깐 밀렸어. 조금 있다가 다시 해줘!"
 
 
 # 회원가입
@@ -102,15 +807,20 @@ def register():
         username = request.form["username"]
         password = request.form["password"]
 
-        hashed_pw = generate_password_hash(password, method="pbkdf2:sha256")
-
         if User.query.filter_by(username=username).first():
             flash("이미 존재하는 아이디입니다.")
             return redirect(url_for("register"))
 
+        try:
+            hashed_pw = password_hasher.hash(password)
+        except HasherBusy:
+            flash(BUSY_MESSAGE)
+            return render_template("register.html"), 503
+
         new_user = User(username=username, password=hashed_pw)
         db.session.add(new_user)
         db.session.commit()
+        invalidate_user_cache(new_user.id)  # 지워진 id가 재사용된 경우 대비
         flash("회원가입 성공! 로그인 해주세요.")
         return redirect(url_for("login"))
     return render_template("register.html")
@@ -124,7 +834,20 @@ def login():
         password = request.form["password"]
         user = User.query.filter_by(username=username).first()
 
-        if user and check_password_hash(user.password, password):
+        try:
+            ok = user is not None and password_hasher.verify(user.password, password)
+        except HasherBusy:
+            flash(BUSY_MESSAGE)
+            return render_template("login.html"), 503
+
+        if ok:
+            if password_hasher.needs_rehash(user.password):
+                # 설정한 해시 방식/비용으로 조용히 갈아 끼운다 (실패해도 로그인은 계속)
+                try:
+                    user.password = password_hasher.hash(password)
+                    db.session.commit()
+                except HasherBusy:
+                    db.session.rollback()
             login_user(user, remember=True)
             session.permanent = True
             session["mascot"] = user.mascot
@@ -138,6 +861,7 @@ def login():
 @app.route("/logout")
 @login_required
 def logout():
+    invalidate_user_cache(current_user.id)
     logout_user()
     session.clear()
     flash("로그아웃되었습니다.")
@@ -155,33 +879,372 @@ def add_greeting_if_needed(user_id):
     greeting_message = "안녕~ 오늘 뭐 했어?"
     
     # 챗봇 인사 메시지 추가
-    new_greeting = ChatLog(
-        user_id=user_id,
-        role="bot",
-        message=greeting_message
-    )
-    db.session.add(new_greeting)
-    db.session.commit()
+    save_chat_logs(user_id, [("bot", greeting_message)])
     
     # 이번 세션에서 인사했다고 표시
     session['greeted'] = True
 
 
+# 대화 기록 페이지 단위 조회
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+
+def history_reset_at(user_id):
+    """/reset 이후의 대화만 보이도록 기준 시각 (없으면 None). 사용자 캐시를 거치지 않고 DB에서 읽는다"""
+    return db.session.scalar(db.select(User.history_reset_at).where(User.id == user_id))
+
+
+def visible_logs(query, user_id):
+    """핫 테이블 쿼리에 /reset 기준을 적용 ((user_id, timestamp) 인덱스 범위로 처리됨)"""
+    reset_at = history_reset_at(user_id)
+    if reset_at is not None:
+        query = query.filter(ChatLog.timestamp > reset_at)
+    return query
+
+
+def log_position(user_id, log_id):
+    """메시지 id의 (timestamp, id). 핫 테이블에 없으면 보관 세그먼트에서 찾는다"""
+    log = db.session.get(ChatLog, log_id)
+    if log is not None:
+        return (log.timestamp, log.id) if log.user_id == user_id else None
+    segment = ChatLogArchive.query.filter(
+        ChatLogArchive.user_id == user_id,
+        ChatLogArchive.first_id <= log_id,
+        ChatLogArchive.last_id >= log_id,
+    ).first()
+    for row in decode_segment(segment) if segment else []:
+        if row["id"] == log_id:
+            return row["timestamp"], row["id"]
+    return None
+
+
+def load_archived_history(user_id, cursor, count):
+    """보관 세그먼트에서 cursor 이전 메시지를 최신순으로 최대 count개"""
+    reset_at = history_reset_at(user_id)
+    query = ChatLogArchive.query.filter(ChatLogArchive.user_id == user_id)
+    if cursor is not None:
+        query = query.filter(ChatLogArchive.first_ts <= cursor[0])
+    if reset_at is not None:
+        query = query.filter(ChatLogArchive.last_ts > reset_at)
+
+    rows = []
+    for segment in query.order_by(ChatLogArchive.last_ts.desc(), ChatLogArchive.id.desc()):
+        rows += [
+            row
+            for row in decode_segment(segment)
+            if (cursor is None or (row["timestamp"], row["id"]) < cursor)
+            and (reset_at is None or row["timestamp"] > reset_at)
+        ]
+        if len(rows) >= count:
+            break
+    rows.sort(key=lambda row: (row["timestamp"], row["id"]), reverse=True)
+    return rows[:count]
+
+
+def load_history_page(user_id, before=None, limit=HISTORY_PAGE_SIZE):
+    """before(메시지 id)보다 이전 메시지 limit개를 시간순으로 반환. (메시지 목록, 더 있는지)
+    핫 테이블에서 모자라면 보관 세그먼트에서 이어서 읽는다 (보관분은 항상 핫 테이블보다 오래됨)"""
+    sync_chat_logs(user_id)
+    query = visible_logs(ChatLog.query.filter(ChatLog.user_id == user_id), user_id)
+
+    cursor = None
+    if before is not None:
+        cursor = log_position(user_id, before)
+        if cursor is None:
+            return [], False
+        query = query.filter(
+            db.or_(
+                ChatLog.timestamp < cursor[0],
+                db.and_(ChatLog.timestamp == cursor[0], ChatLog.id < cursor[1]),
+            )
+        )
+
+    # (user_id, timestamp) 인덱스를 거꾸로 읽어 최근 limit+1개만 가져온다
+    logs = [
+        {"id": log.id, "role": log.role, "message": log.message, "timestamp": log.timestamp}
+        for log in query.order_by(ChatLog.timestamp.desc(), ChatLog.id.desc())
+        .limit(limit + 1)
+        .all()
+    ]
+    if len(logs) <= limit:
+        oldest = (logs[-1]["timestamp"], logs[-1]["id"]) if logs else cursor
+        logs += load_archived_history(user_id, oldest, limit + 1 - len(logs))
+
+    has_more = len(logs) > limit
+    messages = [
+        {"id": log["id"], "role": log["role"], "message": log["message"]}
+        for log in reversed(logs[:limit])
+    ]
+    return messages, has_more
+
+
 # 채팅 페이지
 @app.route("/")
 @login_required
 def chat_page():
     # 🆕 브라우저를 새로 열었을 때만 인사 추가
     add_greeting_if_needed(current_user.id)
-    
-    logs = (
-        ChatLog.query.filter_by(user_id=current_user.id)
-        .order_by(ChatLog.timestamp)
-        .all()
-    )
-    chat_history = [{"role": log.role, "message": log.message} for log in logs]
+
+    chat_history, has_more = load_history_page(current_user.id)
     return render_template(
-        "index.html", username=current_user.username, history=chat_history
+        "index.html",
+        username=current_user.username,
+        history=chat_history,
+        has_more=has_more,
+    )
+
+
+# 이전 대화 더 불러오기 (무한 스크롤)
+@app.route("/history")
+@login_required
+def history():
+    before = request.args.get("before", type=int)
+    limit = request.args.get("limit", HISTORY_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+
+    messages, has_more = load_history_page(current_user.id, before, limit)
+    return jsonify({"messages": messages, "has_more": has_more})
+
+
+# 📤 대화 기록 내보내기: /export?format=ndjson|csv
+# 보관 세그먼트(오래된 순) → 핫 테이블 순서로 한 줄씩 만들어 바로 보낸다.
+# 핫 테이블은 yield_per로 EXPORT_BATCH_SIZE행씩만 읽으므로 기록이 아무리 많아도 메모리는 일정하다
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FIELDS = ["id", "role", "message", "timestamp", "mood_score"]
+
+
+def iter_export_rows(user_id):
+    """/reset 이후의 대화를 시간순으로 (id, role, message, timestamp, mood_score)"""
+    reset_at = history_reset_at(user_id)
+
+    segments = ChatLogArchive.query.filter(ChatLogArchive.user_id == user_id)
+    if reset_at is not None:
+        segments = segments.filter(ChatLogArchive.last_ts > reset_at)
+    for segment in segments.order_by(ChatLogArchive.first_ts, ChatLogArchive.id).yield_per(10):
+        for row in decode_segment(segment):
+            if reset_at is None or row["timestamp"] > reset_at:
+                yield row["id"], row["role"], row["message"], row["timestamp"], row["mood_score"]
+        time.sleep(0)  # gevent 워커에서 같은 워커의 다른 요청에 차례를 넘긴다
+
+    query = visible_logs(
+        db.session.query(
+            ChatLog.id, ChatLog.role, ChatLog.message, ChatLog.timestamp, ChatLog.mood_score
+        ).filter(ChatLog.user_id == user_id),
+        user_id,
+    )
+    for i, row in enumerate(
+        query.order_by(ChatLog.timestamp, ChatLog.id).yield_per(EXPORT_BATCH_SIZE), 1
+    ):
+        yield tuple(row)
+        if i % EXPORT_BATCH_SIZE == 0:
+            time.sleep(0)
+
+
+def export_record(row):
+    log_id, role, message, timestamp, mood_score = row
+    # DB에는 UTC로 저장되어 있으므로 받는 쪽이 헷갈리지 않게 오프셋을 붙인다
+    return [log_id, role, message, timestamp.replace(tzinfo=timezone.utc).isoformat(), mood_score]
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_FIELDS, export_record(row))), ensure_ascii=False) + "\n"
+
+
+def gzip_csv_chunks(rows, flush_every=EXPORT_BATCH_SIZE):
+    """CSV(엑셀용 BOM 포함)를 gzip으로 압축하면서 조각 단위로 내보낸다"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 → gzip 헤더
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(EXPORT_FIELDS)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(export_record(row))
+        if i % flush_every == 0:
+            chunk = compressor.compress(buffer.getvalue().encode("utf-8"))
+            buffer.seek(0)
+            buffer.truncate()
+            if chunk:
+                yield chunk
+    yield compressor.compress(buffer.getvalue().encode("utf-8")) + compressor.flush()
+
+
+@app.route("/export")
+@login_required
+def export_history():
+    export_format = request.args.get("format", "ndjson")
+    if export_format not in ("ndjson", "csv"):
+        return jsonify({"error": "format은 ndjson 또는 csv만 가능합니다"}), 400
+
+    user_id = current_user.id
+    sync_chat_logs(user_id)
+    stamp = kst_date(datetime.utcnow()).isoformat()
+    rows = iter_export_rows(user_id)
+
+    if export_format == "csv":
+        body, mimetype, filename = gzip_csv_chunks(rows), "application/gzip", f"kirri_chat_{stamp}.csv.gz"
+    else:
+        body, mimetype, filename = ndjson_lines(rows), "application/x-ndjson", f"kirri_chat_{stamp}.ndjson"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+# 🔎 대화 검색: /search?q=&page=&limit=
+# 색인으로 검색 단어의 바이그램이 모두 들어 있는 메시지 id를 최근 것부터 SEARCH_MAX_CANDIDATES개
+# 뽑고, 원문으로 다시 확인해서 점수(단어 빈도 · 길이) → 최신순으로 정렬한다.
+# 후보가 상한에 걸리면 오래된 일치는 빠질 수 있다 (응답의 truncated).
+#   SEARCH_MAX_CANDIDATES  원문을 읽어 순위를 매길 최대 후보 수 (기본 200 = 20개씩 10쪽)
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 50
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "200"))
+SEARCH_PREFIX_MAX_GRAMS = 32
+
+
+def prefix_grams(user_id, char):
+    """이 사용자 색인에서 char로 시작하는 바이그램들 (인덱스를 한 칸씩 건너뛰며 읽음). 너무 많으면 None"""
+    gram = ChatSearchGram.gram
+    upper = chr(ord(char) + 1)
+    grams = []
+    while len(grams) <= SEARCH_PREFIX_MAX_GRAMS:
+        lower = gram > grams[-1] if grams else gram >= char
+        found = db.session.scalar(
+            db.select(gram)
+            .where(ChatSearchGram.user_id == user_id, lower, gram < upper)
+            .order_by(gram)
+            .limit(1)
+        )
+        if found is None:
+            return grams
+        grams.append(found)
+    return None
+
+
+def search_candidates(user_id, terms, limit):
+    """검색 단어의 바이그램이 모두 색인된 메시지 id (최근 것부터 최대 limit개)"""
+    exact, prefixes = query_grams(terms)
+    groups = [[g] for g in exact]  # 그룹마다 바이그램 하나 이상이 있어야 한다
+    wide = []
+    for char in prefixes:
+        grams = prefix_grams(user_id, char)
+        if grams == []:
+            return []
+        if grams is None:
+            wide.append(char)  # 이어지는 글자가 너무 다양하면 원문 확인(search_score)에만 맡긴다
+        else:
+            groups.append(grams)
+
+    # 첫 그룹의 (user_id, gram, log_id) 인덱스를 최신 id부터 읽으면서 나머지 그룹은 기본키로
+    # 한 건씩 확인한다 → limit개를 채우면 바로 멈춘다 (자주 나오는 단어일수록 빨리 끝남)
+    table = ChatSearchGram.__table__
+    driver = table.alias("driver")
+    if groups:
+        first = groups.pop(0)
+        stmt = db.select(driver.c.log_id).where(
+            driver.c.user_id == user_id,
+            driver.c.gram == first[0] if len(first) == 1 else driver.c.gram.in_(first),
+        )
+        if len(first) > 1:
+            stmt = stmt.distinct()
+    else:
+        stmt = db.select(driver.c.log_id).distinct().where(
+            driver.c.user_id == user_id,
+            driver.c.gram >= wide[0],
+            driver.c.gram < chr(ord(wide[0]) + 1),
+        )
+    for grams in groups:
+        other = table.alias()
+        stmt = stmt.where(
+            db.exists().where(
+                other.c.user_id == user_id,
+                other.c.gram == grams[0] if len(grams) == 1 else other.c.gram.in_(grams),
+                other.c.log_id == driver.c.log_id,
+            )
+        )
+    return db.session.scalars(stmt.order_by(driver.c.log_id.desc()).limit(limit)).all()
+
+
+def load_search_rows(user_id, ids):
+    """후보 id의 (id, role, message, timestamp). 핫 테이블에 없으면 보관 세그먼트에서 찾는다"""
+    reset_at = history_reset_at(user_id)
+    # id로만 찾아야 기본키를 쓴다 (user_id/timestamp 조건을 붙이면 (user_id, timestamp) 인덱스를 훑음)
+    rows, found = {}, set()
+    for log_id, owner, role, message, timestamp in db.session.execute(
+        db.select(ChatLog.id, ChatLog.user_id, ChatLog.role, ChatLog.message, ChatLog.timestamp).where(
+            ChatLog.id.in_(ids)
+        )
+    ):
+        found.add(log_id)
+        if owner == user_id and (reset_at is None or timestamp > reset_at):
+            rows[log_id] = (log_id, role, message, timestamp)
+    missing = set(ids) - found
+    if missing:
+        segments = ChatLogArchive.query.filter(
+            ChatLogArchive.user_id == user_id,
+            ChatLogArchive.first_id <= max(missing),
+            ChatLogArchive.last_id >= min(missing),
+        )
+        for segment in segments:
+            for row in decode_segment(segment):
+                if row["id"] in missing and (reset_at is None or row["timestamp"] > reset_at):
+                    rows[row["id"]] = (row["id"], row["role"], row["message"], row["timestamp"])
+    return list(rows.values())
+
+
+def search_history(user_id, query):
+    """(점수 높은 순 · 최신순 결과 목록, 후보가 상한에 걸렸는지)"""
+    terms = query_terms(query)
+    ids = search_candidates(user_id, terms, SEARCH_MAX_CANDIDATES)
+    matches = []
+    for log_id, role, message, timestamp in load_search_rows(user_id, ids):
+        score = search_score(message, terms)
+        if score is not None:
+            matches.append(
+                {"id": log_id, "role": role, "message": message, "timestamp": timestamp, "score": score}
+            )
+    matches.sort(key=lambda m: (m["score"], m["timestamp"], m["id"]), reverse=True)
+    return matches, len(ids) >= SEARCH_MAX_CANDIDATES
+
+
+@app.route("/search")
+@login_required
+def search():
+    query = request.args.get("q", "")
+    if not query_terms(query):
+        return jsonify({"error": "검색어를 입력해 주세요"}), 400
+    page = max(1, request.args.get("page", 1, type=int))
+    limit = max(1, min(request.args.get("limit", SEARCH_PAGE_SIZE, type=int), SEARCH_MAX_PAGE_SIZE))
+
+    sync_chat_logs(current_user.id)
+    with span("search"):
+        matches, truncated = search_history(current_user.id, query)
+    start = (page - 1) * limit
+    results = [
+        {
+            "id": m["id"],
+            "role": m["role"],
+            "message": m["message"],
+            "timestamp": m["timestamp"].replace(tzinfo=timezone.utc).isoformat(),
+            "score": round(m["score"], 3),
+        }
+        for m in matches[start : start + limit]
+    ]
+    return jsonify(
+        {
+            "query": query,
+            "results": results,
+            "page": page,
+            "total": len(matches),
+            "has_more": start + limit < len(matches),
+            "truncated": truncated,
+        }
     )
 
 
@@ -209,6 +1272,7 @@ def customize():
         if selected in all_mascots:
             current_user.mascot = selected
             db.session.commit()
+            invalidate_user_cache(current_user.id)
             session["mascot"] = selected
             
             return jsonify({"success": True, "message": "저장 완료!"})
@@ -218,11 +1282,66 @@ def customize():
     return render_template(
         "customize.html",
         acc_data=acc_data,
-        clothes_data=clothes_data)
+        clothes_data=clothes_data,
+        mascot_urls={f: asset_url(f"mascot/{f}") for f in all_mascots})
 
 
 # 챗봇 로직
-from chat_logic import classify_and_respond
+from chat_logic import classify_and_respond, reset_context
+
+
+# =========================
+# 🚦 /chat 입장 제어 (admission.py)
+# =========================
+#   CHAT_MAX_ACTIVE             워커당 동시에 LLM 응답을 기다리는 요청 수 (기본 50)
+#   CHAT_MAX_QUEUE              자리가 날 때까지 기다릴 수 있는 요청 수 (기본 100)
+#   CHAT_QUEUE_TIMEOUT_SECONDS  대기열에서 기다리는 최대 시간 (기본 10)
+#   CHAT_RATE_PER_MINUTE        사용자당 분당 메시지 수 (기본 20)
+#   CHAT_RATE_BURST             한 번에 몰아서 보낼 수 있는 메시지 수 (기본 5)
+chat_limiter = ConcurrencyLimiter(
+    max_active=int(os.getenv("CHAT_MAX_ACTIVE", "50")),
+    max_queue=int(os.getenv("CHAT_MAX_QUEUE", "100")),
+    queue_timeout=float(os.getenv("CHAT_QUEUE_TIMEOUT_SECONDS", "10")),
+)
+chat_rate = TokenBucket(
+    rate_per_minute=float(os.getenv("CHAT_RATE_PER_MINUTE", "20")),
+    burst=int(os.getenv("CHAT_RATE_BURST", "5")),
+)
+
+REJECTED_MESSAGES = {
+    "rate_limited": "너무 빨리 말하고 있어! 잠깐 숨 좀 돌리고 다시 말해줘~",
+    "queue_full": "지금 말 거는 친구들이 너무 많아서 잠깐 밀렸어ㅠㅠ",
+    "queue_timeout": "지금 말 거는 친구들이 너무 많아서 잠깐 밀렸어ㅠㅠ",
+    "in_progress": "아까 보낸 말에 아직 대답하는 중이야! 잠깐만 기다려줘~",
+}
+
+# 같은 Idempotency-Key로 다시 온 메시지는 LLM을 다시 부르지 않고 답변을 재사용 (idempotency.py)
+#   CHAT_IDEMPOTENCY_TTL_SECONDS  끝난 답변을 다시 돌려줄 수 있는 시간 (기본 600)
+chat_requests = IdempotentRequests(
+    create_state_store(), ttl=int(os.getenv("CHAT_IDEMPOTENCY_TTL_SECONDS", "600"))
+)
+
+
+def begin_chat_request(user_id):
+    """("replay", 답변) 또는 ("owner", 토큰/None). 원래 요청이 너무 오래 걸리면 409"""
+    key = request_key(request.headers)
+    if key is None:
+        return "owner", None
+    try:
+        return chat_requests.begin(user_id, key)
+    except TimeoutError:
+        raise Rejected(409, "in_progress", 2)
+
+
+@app.errorhandler(Rejected)
+def rejected_response(e):
+    """429(사용자 속도 제한) / 503(과부하) / 409(같은 메시지 처리 중)를 Retry-After와 함께 바로 돌려준다"""
+    response = jsonify(
+        {"error": e.reason, "response": REJECTED_MESSAGES[e.reason], "retry_after": e.retry_after}
+    )
+    response.status_code = e.status
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
 
 
 @app.route("/chat", methods=["POST"])
@@ -231,63 +1350,151 @@ def chat():
     user_id = current_user.id
     message = request.form.get("message")
 
-    from chat_logic import classify_and_respond
+    from chat_logic import classify_and_respond, CONTEXT_HISTORY_LIMIT
+
+    kind, token = begin_chat_request(user_id)
+    if kind == "replay":
+        return jsonify({"response": token})
+
+    try:
+        chat_rate.take(user_id)
+        with chat_limiter.acquire("/chat"):
+            # 최근 대화를 맥락으로 넘긴다 (토큰 예산에 맞춰 자르는 건 chat_logic에서)
+            history, _ = load_history_page(user_id, limit=CONTEXT_HISTORY_LIMIT)
+
+            # LLM 응답을 기다리는 동안 DB 커넥션을 풀에 돌려준다 (gevent 워커에서 동시 대화 수 확보)
+            db.session.close()
+            bot_reply = classify_and_respond(message, user_id, history)
+
+        save_chat_logs(user_id, [("user", message), ("bot", bot_reply)])
+    except Exception as e:
+        if token:
+            chat_requests.fail(token, e)
+        raise
+    except BaseException:
+        if token:
+            chat_requests.fail(token)
+        raise
+    if token:
+        chat_requests.finish(token, bot_reply)
 
-    bot_reply = classify_and_respond(message, user_id)
+    return jsonify({"response": bot_reply})
 
-    db.session.add(ChatLog(user_id=user_id, role="user", message=message))
-    db.session.add(ChatLog(user_id=user_id, role="bot", message=bot_reply))
-    db.session.commit()
 
-    return jsonify({"response": bot_reply})
+# 🌊 스트리밍 채팅 (Server-Sent Events)
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route("/chat/stream", methods=["POST"])
+@login_required
+def chat_stream():
+    user_id = current_user.id
+    message = request.form.get("message")
+
+    from chat_logic import stream_and_respond, CONTEXT_HISTORY_LIMIT
+
+    kind, token = begin_chat_request(user_id)
+    if kind == "replay":
+        # 이미 끝났거나 먼저 온 요청이 방금 끝낸 답변을 한 번에 보낸다
+        return sse_response(iter([sse_event("done", {"response": token})]))
+
+    # 거절은 스트림을 열기 전에 해야 클라이언트가 상태 코드로 알 수 있다
+    slot = None
+    try:
+        chat_rate.take(user_id)
+        slot = chat_limiter.acquire("/chat/stream")
+        history, _ = load_history_page(user_id, limit=CONTEXT_HISTORY_LIMIT)
+    except Exception as e:
+        if slot is not None:
+            slot.release()
+        if token:
+            chat_requests.fail(token, e)
+        raise
+    db.session.close()
+    settled = []
+
+    def generate():
+        parts = []
+        try:
+            for kind, text in stream_and_respond(message, user_id, history):
+                parts.append(f"\n\n{text}" if kind == "phq" else text)
+                yield sse_event(kind, {"text": text})
+        finally:
+            slot.release()
+
+        # 스트림이 끝난 뒤 완성된 답변을 저장
+        bot_reply = "".join(parts).strip()
+        save_chat_logs(user_id, [("user", message), ("bot", bot_reply)])
+        if token:
+            chat_requests.finish(token, bot_reply)
+        settled.append(True)
+
+        yield sse_event("done", {"response": bot_reply})
+
+    def on_close():
+        slot.release()  # 본문을 보내기 전에 연결이 끊긴 경우
+        if token and not settled:
+            chat_requests.fail(token)  # 기다리던 중복 요청이 이어받는다
+
+    response = sse_response(generate())
+    response.call_on_close(on_close)
+    return response
+
+
+def sse_response(events):
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # 새로고침(대화 초기화)
 @app.route("/reset", methods=["POST"])
 @login_required
 def reset_chat():
-    ChatLog.query.filter_by(user_id=current_user.id).delete()
+    sync_chat_logs(current_user.id)
+    # 대화 삭제는 기준 시각만 바꾸는 논리 삭제. 실제 행은 compact-chatlogs가 나중에 지운다
+    current_user.history_reset_at = datetime.utcnow()
+    MoodDaily.query.filter_by(user_id=current_user.id).delete()
     db.session.commit()
+    invalidate_user_cache(current_user.id)
+    invalidate_report_cache(current_user.id)
+    reset_context(current_user.id)
     return jsonify({"message": "Chat history cleared."})
 
 
-# 감정 분석 및 리포트 생성 함수
-def generate_emotion_report(user_id):
-    kst_offset = timedelta(hours=9)
-    now_kst = datetime.utcnow() + kst_offset
-    
-    logs = (
-        ChatLog.query.filter(
-            ChatLog.user_id == user_id,
-            ChatLog.role == "user",
-            ChatLog.timestamp >= datetime.utcnow() - timedelta(days=7),
-        )
-        .order_by(ChatLog.timestamp)
-        .all()
+# 리포트 캐시: (KST 날짜, 사용자의 마지막 ChatLog id)가 같으면 다시 계산/렌더링하지 않는다
+report_cache = create_state_store()
+
+
+def report_fingerprint(user_id):
+    today_kst = kst_date(datetime.utcnow()).isoformat()
+    latest_id = (
+        visible_logs(db.session.query(ChatLog.id).filter(ChatLog.user_id == user_id), user_id)
+        .order_by(ChatLog.timestamp.desc(), ChatLog.id.desc())
+        .limit(1)
+        .scalar()
     )
+    return [today_kst, latest_id]
 
-    mood_keywords = [
-        "힘들",
-        "우울",
-        "무기력",
-        "짜증",
-        "귀찮",
-        "죽고 싶",
-        "의욕없",
-        "불안",
-    ]
 
-    daily_score = {
-        (now_kst.date() - timedelta(days=i)): 0 for i in range(6, -1, -1)
-    }
+def invalidate_report_cache(user_id):
+    report_cache.delete(f"report:{user_id}")
 
-    for log in logs:
-        log_time_kst = log.timestamp + kst_offset
-        date = log_time_kst.date()
-        
-        if date in daily_score:
-            score = sum(1 for kw in mood_keywords if kw in log.message)
-            daily_score[date] = daily_score.get(date, 0) + score
+
+# 감정 분석 및 리포트 생성 함수
+def generate_emotion_report(user_id):
+    sync_chat_logs(user_id)
+    with span("report_cache"):
+        fingerprint = report_fingerprint(user_id)
+        cached = report_cache.get(f"report:{user_id}")
+    if cached and cached["fingerprint"] == fingerprint:
+        return {"username": current_user.username, **cached["report"]}
+
+    with span("report_query"):
+        daily_score = get_daily_mood(user_id, 7)
 
     dates = sorted(daily_score.keys())
     scores = [daily_score[d] for d in dates]
@@ -321,88 +1528,14 @@ def generate_emotion_report(user_id):
     else:
         level, advice = "중증 우울 ⚠️", "심한 우울감이 보여. 꼭 주변에 도움을 요청하자."
 
-    graph_filename = None
-    if total_score > 0 or any(d in daily_score for d, s in zip(dates, scores)):
-        try:
-            # 우울 점수를 6단계로 변환하는 함수
-            def score_to_level(score):
-                if score == 0:
-                    return 0  # 정상
-                elif 1 <= score <= 4:
-                    return 1  # 경미한 저하
-                elif 5 <= score <= 9:
-                    return 2  # 약한 우울
-                elif 10 <= score <= 14:
-                    return 3  # 중등도 우울
-                elif 15 <= score <= 19:
-                    return 4  # 심한 우울
-                else:
-                    return 5  # 중증 우울
-            
-            # 점수를 레벨로 변환
-            level_scores = [score_to_level(s) for s in scores]
-            
-            fig, ax = plt.subplots(figsize=(8, 4))
-            fig.patch.set_facecolor("white")
-            ax.set_facecolor("#f9f9f9")
-
-            # 선 그래프 그리기
-            ax.plot(
-                dates, level_scores, color="#2a6fb4", linestyle="-", linewidth=2, 
-                marker='o', markersize=8, markerfacecolor='#2a6fb4', 
-                markeredgecolor='white', markeredgewidth=2, zorder=2
-            )
-
-            # Y축 범위 설정 (0~5, 6단계)
-            ax.set_ylim(-0.5, 5.5)
-            ax.invert_yaxis()  # Y축 반전 (0이 위, 5가 아래)
-
-            # Y축에 텍스트 이모티콘 추가
-            # 환하게 웃는 이모지 (Y축 상단, level=0)
-            ax.text(-0.15, 0, '😊', transform=ax.get_yaxis_transform(), 
-                   fontsize=30, ha='center', va='center')
-            
-            # 슬프게 우는 이모지 (Y축 하단, level=5)
-            ax.text(-0.15, 5, '😢', transform=ax.get_yaxis_transform(), 
-                   fontsize=30, ha='center', va='center')
-
-            # Y축 눈금 설정 (0~5)
-            ax.set_yticks([0, 1, 2, 3, 4, 5])
-            ax.set_yticklabels([])  # 숫자는 숨기기
-            
-            # X축 설정
-            ax.set_xlabel("")
-            ax.xaxis.set_major_formatter(matplotlib.dates.DateFormatter("%m/%d"))
-            plt.xticks(rotation=0, fontsize=10, color="#555555")
-            ax.tick_params(axis="x", which="both", bottom=False, top=False)
-            ax.tick_params(axis="y", which="both", left=False, right=False)
-
-            # 테두리 제거
-            ax.set_ylabel("")
-            ax.spines["top"].set_visible(False)
-            ax.spines["right"].set_visible(False)
-            ax.spines["bottom"].set_visible(False)
-            ax.spines["left"].set_visible(False)
-
-            plt.tight_layout()
-            os.makedirs("static", exist_ok=True)
-
-            graph_filename = f"mood_graph_{user_id}.png"
-            graph_full_path = os.path.join("static", graph_filename)
-            plt.savefig(graph_full_path, dpi=100, bbox_inches='tight')
-            plt.close()
-
-        except Exception as e:
-            print(f"Error generating graph: {e}")
-            graph_filename = None
-
-    return {
-        "username": current_user.username,
+    # 그래프는 브라우저가 /api/mood 데이터로 직접 그린다
+    report = {
         "score": total_score,
         "level": level,
         "advice": advice,
-        "graph": graph_filename,
     }
+    report_cache.set(f"report:{user_id}", {"fingerprint": fingerprint, "report": report})
+    return {"username": current_user.username, **report}
 
 
 # 감정 분석
@@ -413,6 +1546,64 @@ def analyze():
     return render_template("result.html", **report_data)
 
 
+# 📈 감정 추이 API: /api/mood?from=2025-01-01&to=2025-03-31&bucket=day|week
+# mood_daily(사용자 · KST 일자별 합계)를 범위 조회 한 번으로 읽어서 묶는다.
+# 주 단위는 월요일 시작. 날짜를 생략하면 오늘까지 최근 7일
+MOOD_API_MAX_DAYS = int(os.getenv("MOOD_API_MAX_DAYS", "366"))
+
+
+def mood_series(user_id, start, end, bucket="day"):
+    """start~end(KST, 양끝 포함)를 bucket 단위로 묶은 점수 · 메시지 수 · 단계 (열 단위 목록)
+    주 단위는 start가 속한 주의 월요일부터 센다 (첫 칸도 그 주 전체, 응답의 from도 그 월요일)"""
+    step = 7 if bucket == "week" else 1
+    first = start - timedelta(days=start.weekday()) if bucket == "week" else start
+    size = (end - first).days // step + 1
+    scores, counts = [0] * size, [0] * size
+
+    rows = db.session.query(MoodDaily.day, MoodDaily.score, MoodDaily.message_count).filter(
+        MoodDaily.user_id == user_id, MoodDaily.day >= first, MoodDaily.day <= end
+    )
+    for day, score, count in rows:
+        i = (day - first).days // step
+        scores[i] += score
+        counts[i] += count
+
+    return {
+        "from": first.isoformat(),
+        "to": end.isoformat(),
+        "bucket": bucket,
+        "dates": [(first + timedelta(days=i * step)).isoformat() for i in range(size)],
+        "scores": scores,
+        "counts": counts,
+        "levels": [score_to_level(score) for score in scores],
+    }
+
+
+@app.route("/api/mood")
+@login_required
+def mood_api():
+    bucket = request.args.get("bucket", "day")
+    try:
+        end = date.fromisoformat(request.args["to"]) if request.args.get("to") else None
+        start = date.fromisoformat(request.args["from"]) if request.args.get("from") else None
+    except ValueError:
+        return jsonify({"error": "from/to는 YYYY-MM-DD 형식이어야 합니다"}), 400
+    end = end or kst_date(datetime.utcnow())
+    start = start or end - timedelta(days=6)
+
+    if bucket not in ("day", "week"):
+        return jsonify({"error": "bucket은 day 또는 week만 가능합니다"}), 400
+    if start > end or (end - start).days >= MOOD_API_MAX_DAYS:
+        return jsonify({"error": f"기간은 1~{MOOD_API_MAX_DAYS}일이어야 합니다"}), 400
+
+    sync_chat_logs(current_user.id)  # 아직 저장 안 된 대화의 점수까지 반영
+    response = jsonify(mood_series(current_user.id, start, end, bucket))
+    # 매번 다시 확인하되 바뀐 게 없으면 304로 본문 없이 끝낸다
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.add_etag()
+    return response.make_conditional(request)
+
+
 # 리포트
 @app.route("/report")
 @login_required
@@ -424,8 +1615,23 @@ def report():
     )
 
 
+# 📈 계측 지표 (Prometheus 텍스트 형식). METRICS_TOKEN을 설정하면 Bearer 토큰 필요
+@app.route("/metrics")
+def metrics_endpoint():
+    token = os.getenv("METRICS_TOKEN")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return Response("unauthorized\n", status=401, mimetype="text/plain")
+    return Response(
+        metrics.registry.render(),
+        mimetype="text/plain; version=0.0.4; charset=utf-8",
+        headers={"Cache-Control": "no-store"},
+    )
+
+
 # 앱 실행
 if __name__ == "__main__":
+    with app.app_context():
+        init_db()
     port = int(os.environ.get("PORT", 10000))
     app.run(host="0.0.0.0", port=port)
 
@@ -0,0 +1,128 @@
+import glob, hashlib, json, os
+from io import BytesIO
+from flask import send_from_directory, url_for
+
+
+# =========================
+# 🖼️ 정적 이미지 빌드 (썸네일 · WebP · 해시 파일명)
+# =========================
+# 원본 PNG는 2000px가 넘어서 화면(34~200px)에 비해 수십 배 무겁다.
+# flask --app app build-assets 가 크기별 변형을 static/build/ 아래에 만들고
+# static/build/manifest.json에 "원본 경로 → 변형 파일" 표를 남긴다.
+# 파일명에 내용 해시가 들어가므로 /assets/ 응답은 1년 immutable로 캐시해도 안전하다.
+# (이름에 해시가 없는 manifest.json만 예외로 매번 다시 확인하게 한다)
+ASSET_SOURCES = ["mascot/*.png", "avatars/*.png", "result/*.png", "mascotwelcome.png"]
+VARIANTS = {"thumb": 192, "display": 480}  # 이름 → 최대 변 길이(px), 2배 밀도 화면 기준
+BUILD_DIR = "build"
+MANIFEST_NAME = "manifest.json"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _encode(image, fmt):
+    buf = BytesIO()
+    if fmt == "webp":
+        image.save(buf, "WEBP", quality=82)
+    else:
+        image.save(buf, "PNG", optimize=True)
+    return buf.getvalue()
+
+
+def build_assets(static_dir, sources=ASSET_SOURCES, variants=VARIANTS):
+    """원본이 바뀐 이미지만 다시 만든다. 이전 해시 파일은 지우지 않음
+    (브라우저 localStorage에 남은 예전 주소가 깨지지 않도록)"""
+    from PIL import Image
+
+    build_dir = os.path.join(static_dir, BUILD_DIR)
+    previous = load_manifest(static_dir)
+    manifest, built = {}, 0
+
+    for pattern in sources:
+        for src in sorted(glob.glob(os.path.join(static_dir, pattern))):
+            rel = os.path.relpath(src, static_dir).replace(os.sep, "/")
+            with open(src, "rb") as f:
+                source_hash = _sha256(f.read())
+
+            entry = previous.get(rel)
+            if (
+                entry
+                and entry["source"] == source_hash
+                and set(entry["variants"]) == set(variants)
+                and all(
+                    os.path.exists(os.path.join(build_dir, v[fmt]))
+                    for v in entry["variants"].values()
+                    for fmt in ("webp", "png")
+                )
+            ):
+                manifest[rel] = entry
+                continue
+
+            entry = {"source": source_hash, "variants": {}}
+            stem = os.path.splitext(rel)[0]
+            with Image.open(src) as image:
+                image.load()
+                for name, max_side in variants.items():
+                    resized = image.copy()
+                    resized.thumbnail((max_side, max_side), Image.LANCZOS)
+                    files = {"width": resized.width, "height": resized.height}
+                    for fmt in ("webp", "png"):
+                        data = _encode(resized, fmt)
+                        filename = f"{stem}.{name}.{_sha256(data)[:10]}.{fmt}"
+                        _write(os.path.join(build_dir, filename), data)
+                        files[fmt] = filename
+                    entry["variants"][name] = files
+            manifest[rel] = entry
+            built += 1
+
+    _write(
+        os.path.join(build_dir, MANIFEST_NAME),
+        json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True).encode(),
+    )
+    _manifest_cache.clear()
+    return manifest, built
+
+
+# =========================
+# 🔗 템플릿에서 쓰는 주소
+# =========================
+_manifest_cache = {}
+
+
+def load_manifest(static_dir):
+    path = os.path.join(static_dir, BUILD_DIR, MANIFEST_NAME)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def asset_url(path, variant="display", fmt="webp"):
+    """원본 static 경로의 변형 주소. 빌드 전이거나 목록에 없으면 원본 주소로 대신한다"""
+    from flask import current_app
+
+    static_dir = current_app.static_folder
+    if static_dir not in _manifest_cache:
+        _manifest_cache[static_dir] = load_manifest(static_dir)
+    entry = _manifest_cache[static_dir].get(path.lstrip("/"))
+    if entry is None or variant not in entry["variants"]:
+        return url_for("static", filename=path.lstrip("/"))
+    return url_for("hashed_asset", filename=entry["variants"][variant][fmt])
+
+
+def send_hashed_asset(static_dir, filename):
+    """/assets/<파일>: 해시 파일명은 1년 immutable 캐시, manifest.json은 매번 재확인(no-cache)"""
+    response = send_from_directory(os.path.join(static_dir, BUILD_DIR), filename, conditional=True)
+    response.headers["Cache-Control"] = "no-cache" if filename == MANIFEST_NAME else IMMUTABLE
+    return response
@@ -0,0 +1,178 @@
+"""DB 동시성 벤치마크: 여러 프로세스 × 스레드가 같은 SQLite 파일에 읽기/쓰기를 섞어서 보낸다.
+
+    python bench/bench_db.py                          # 예전 설정(DB_PROFILE=off)과 현재 프로필 비교
+    python bench/bench_db.py --processes 4 --threads 8 --duration 15 --write-ratio 0.3
+    python bench/bench_db.py --database-url postgresql://localhost/kirri --profiles auto
+
+gunicorn 워커 여러 개를 흉내 내서 프로세스마다 앱을 import하고, 스레드마다
+쓰기는 write_chat_logs(대화 2줄 + mood_daily upsert 한 트랜잭션),
+읽기는 load_history_page + get_daily_mood(채팅 페이지 · 리포트와 같은 쿼리)를 반복한다.
+프로필별 초당 처리량, p50/p95/p99 지연, "database is locked" 같은 오류 수를 출력한다.
+"""
+import argparse, json, os, random, subprocess, sys, tempfile, threading, time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+USERS = 50
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def app_env(database_url, profile):
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "bench")
+    env["DATABASE_URL"] = database_url
+    env["DB_PROFILE"] = profile
+    env.pop("CHATLOG_WRITE_BEHIND", None)  # 쓰기를 요청 안에서 바로 커밋하는 기본 경로를 잰다
+    return env
+
+
+# =========================
+# 👷 워커 프로세스 (이 파일을 --worker로 다시 실행)
+# =========================
+def setup():
+    import app as kirri
+
+    with kirri.app.app_context():
+        kirri.init_db()
+        existing = {u.username for u in kirri.User.query.filter(kirri.User.username.like("bench%"))}
+        for i in range(USERS):
+            if f"bench{i}" not in existing:
+                kirri.db.session.add(kirri.User(username=f"bench{i}", password="x"))
+        kirri.db.session.commit()
+
+
+def worker(args):
+    import app as kirri
+    from sqlalchemy.exc import OperationalError
+
+    deadline = time.time() + args.duration
+    results = {"read": [], "write": [], "errors": {}}
+    lock = threading.Lock()
+
+    def run(seed):
+        rng = random.Random(seed)
+        with kirri.app.app_context():
+            while time.time() < deadline:
+                user_id = rng.randint(1, USERS)
+                kind = "write" if rng.random() < args.write_ratio else "read"
+                start = time.perf_counter()
+                try:
+                    if kind == "write":
+                        kirri.write_chat_logs(
+                            [(user_id, kirri.datetime.utcnow(), [("user", "오늘 좀 힘들었어"), ("bot", "그랬구나")])]
+                        )
+                    else:
+                        kirri.load_history_page(user_id, limit=50)
+                        kirri.get_daily_mood(user_id, 7)
+                    kirri.db.session.close()
+                except OperationalError as e:
+                    kirri.db.session.rollback()
+                    message = str(e.orig).split("\n")[0]
+                    with lock:
+                        results["errors"][message] = results["errors"].get(message, 0) + 1
+                    continue
+                with lock:
+                    results[kind].append(time.perf_counter() - start)
+
+    threads = [
+        threading.Thread(target=run, args=(os.getpid() * 1000 + i,)) for i in range(args.threads)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    json.dump(results, sys.stdout)
+
+
+# =========================
+# 📊 측정 · 비교
+# =========================
+def run_profile(args, profile):
+    workdir = tempfile.mkdtemp(prefix="kirri-bench-db-")
+    database_url = args.database_url or f"sqlite:///{workdir}/bench.db"
+    env = app_env(database_url, profile)
+    script = os.path.abspath(__file__)
+    subprocess.run([sys.executable, script, "--setup"], cwd=ROOT, env=env, check=True)
+
+    cmd = [
+        sys.executable, script, "--worker",
+        "--threads", str(args.threads),
+        "--duration", str(args.duration),
+        "--write-ratio", str(args.write_ratio),
+    ]
+    procs = [
+        subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True)
+        for _ in range(args.processes)
+    ]
+    merged = {"read": [], "write": [], "errors": {}}
+    for proc in procs:
+        out, _ = proc.communicate()
+        data = json.loads(out)
+        merged["read"] += data["read"]
+        merged["write"] += data["write"]
+        for message, count in data["errors"].items():
+            merged["errors"][message] = merged["errors"].get(message, 0) + count
+
+    summary = {"profile": profile, "errors": merged["errors"]}
+    for kind in ("read", "write"):
+        values = merged[kind]
+        summary[kind] = {
+            "ops_per_s": round(len(values) / args.duration, 1),
+            **{
+                f"p{p}_ms": round(percentile(values, p) * 1000, 2) if values else None
+                for p in (50, 95, 99)
+            },
+        }
+    return summary
+
+
+def print_table(summaries):
+    print(f"\n{'profile':<8} {'kind':<6} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for summary in summaries:
+        for kind in ("read", "write"):
+            row = summary[kind]
+            cells = [row["ops_per_s"], row["p50_ms"], row["p95_ms"], row["p99_ms"]]
+            print(f"{summary['profile']:<8} {kind:<6} " + " ".join(f"{str(c):>9}" for c in cells))
+        errors = sum(summary["errors"].values())
+        if errors:
+            print(f"{'':<8} errors {errors}: {summary['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=4, help="gunicorn 워커 수에 해당")
+    parser.add_argument("--threads", type=int, default=8, help="프로세스당 동시 요청 수")
+    parser.add_argument("--duration", type=float, default=10, help="측정 시간(초)")
+    parser.add_argument("--write-ratio", type=float, default=0.3)
+    parser.add_argument("--profiles", default="off,auto", help="비교할 DB_PROFILE 값들")
+    parser.add_argument("--database-url", default=None, help="기본: 프로필마다 새 임시 SQLite 파일")
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--setup", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.setup:
+        return setup()
+    if args.worker:
+        return worker(args)
+
+    print(
+        f"{args.processes} processes × {args.threads} threads, {args.duration:g}s, "
+        f"write ratio {args.write_ratio:g}"
+    )
+    summaries = [run_profile(args, profile) for profile in args.profiles.split(",")]
+    print_table(summaries)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
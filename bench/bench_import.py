@@ -0,0 +1,68 @@
+"""`import app` 시작 시간 측정 + 예산 검사.
+
+    python bench/bench_import.py [--runs 5] [--top 15] [--budget-ms 1000]
+
+`python -X importtime -c "import app"`를 새 프로세스로 여러 번 돌려서
+가장 빠른 회차의 누적 import 시간과 오래 걸린 모듈을 보여준다.
+중앙값이 예산(기본 1000ms, 측정 당시 약 550ms)을 넘으면 종료 코드 1로 끝난다 (CI 회귀 검사용).
+--budget-ms 0이면 측정만 하고 검사는 건너뛴다.
+gunicorn 워커가 부팅할 때마다 이 비용을 내므로, matplotlib · openai 같은 무거운
+모듈이 다시 import 시점으로 올라오면 여기서 바로 드러난다.
+"""
+import argparse, os, re, statistics, subprocess, sys, tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_BUDGET_MS = 1000
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure_once():
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "bench")
+    # 실제 DB를 건드리지 않도록 임시 SQLite 사용 (import만 하므로 파일은 만들어지지 않음)
+    env["DATABASE_URL"] = f"sqlite:///{tempfile.gettempdir()}/bench_import.db"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = []
+    for line in proc.stderr.splitlines():
+        m = LINE.match(line)
+        if m:
+            self_us, cumulative_us, indent, name = m.groups()
+            modules.append((name, len(indent) // 2, int(self_us), int(cumulative_us)))
+    total_us = next(cum for name, depth, _, cum in modules if name == "app" and depth == 0)
+    return total_us / 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="0이면 검사 안 함")
+    args = parser.parse_args()
+
+    results = [measure_once() for _ in range(args.runs)]
+    totals = [total for total, _ in results]
+    best_total, best_modules = min(results, key=lambda r: r[0])
+    median = statistics.median(totals)
+
+    print(f"import app: 중앙값 {median:.0f}ms, 최소 {best_total:.0f}ms ({args.runs}회)")
+    print("\n직접 import한 모듈 중 오래 걸린 순 (누적 ms):")
+    top_level = [m for m in best_modules if m[1] == 1]
+    for name, _, _, cumulative in sorted(top_level, key=lambda m: -m[3])[: args.top]:
+        print(f"  {cumulative / 1000:8.1f}  {name}")
+
+    if args.budget_ms and median > args.budget_ms:
+        print(f"\n❌ 예산 초과: {median:.0f}ms > {args.budget_ms:.0f}ms")
+        sys.exit(1)
+    if args.budget_ms:
+        print(f"\n✅ 예산 이내: {median:.0f}ms <= {args.budget_ms:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""키워드 매처 마이크로 벤치마크.
+
+    python bench/bench_keywords.py [--messages 20000] [--repeat 5]
+
+기존 방식(키워드마다 `in` 검사 + PHQ 정규식 사다리)과 mood.keyword_matcher를
+같은 입력으로 돌려 결과가 같은지 확인하고 걸린 시간을 비교한다.
+"""
+import argparse, os, random, re, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from mood import (  # noqa: E402
+    MOOD_KEYWORDS,
+    NEGATIVE_WORDS,
+    POSITIVE_WORDS,
+    PHQ_FREQUENCY_WORDS,
+    keyword_matcher,
+    score_messages,
+)
+
+FILLER = [
+    "오늘 학교에서 친구랑 점심 먹었는데",
+    "수학 시간에 졸려서",
+    "집에 와서 유튜브 보다가",
+    "학원 숙제가 너무 많아서",
+    "주말에 뭐 할지 고민 중이야",
+    "그냥 그랬어",
+    "ㅋㅋㅋ 진짜 웃겼음",
+]
+VOCAB = sorted(
+    set(MOOD_KEYWORDS + POSITIVE_WORDS + NEGATIVE_WORDS)
+    | {w for words in PHQ_FREQUENCY_WORDS.values() for w in words}
+)
+PHQ_PATTERNS = [
+    re.compile("(" + "|".join(words) + ")") for _, words in sorted(PHQ_FREQUENCY_WORDS.items())
+]
+
+
+# --- 기존 구현 (비교 기준) ---
+def legacy(text):
+    mood = sum(1 for kw in MOOD_KEYWORDS if kw in text)
+    negative = any(w in text for w in NEGATIVE_WORDS)
+    positive = any(w in text for w in POSITIVE_WORDS)
+    t = text.lower()
+    phq = next((level for level, p in enumerate(PHQ_PATTERNS) if p.search(t)), 1)
+    return mood, negative, positive, phq
+
+
+def matcher(text):
+    hits = keyword_matcher.match(text)
+    levels = [level for level in range(4) if f"phq{level}" in hits]
+    return (
+        hits.get("mood", 0),
+        "negative" in hits,
+        "positive" in hits,
+        min(levels) if levels else 1,
+    )
+
+
+def make_messages(n, min_words, max_words, seed=0):
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(n):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(min_words, max_words))]
+        words += rng.sample(VOCAB, rng.randint(0, 2))
+        rng.shuffle(words)
+        messages.append(" ".join(words))
+    return messages
+
+
+def best_of(fn, data, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(data)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = {
+        "짧은 메시지": make_messages(args.messages, 1, 3),
+        "긴 메시지(~1KB)": make_messages(args.messages // 10, 40, 60, seed=1),
+    }
+    for name, messages in cases.items():
+        assert [legacy(m) for m in messages] == [matcher(m) for m in messages], name
+
+        old = best_of(lambda data: [legacy(m) for m in data], messages, args.repeat)
+        new = best_of(lambda data: [matcher(m) for m in data], messages, args.repeat)
+        print(f"{name:<14} {len(messages):>6}건  기존 {old:8.1f}ms  매처 {new:8.1f}ms  x{old / new:.1f}")
+
+    # 백필처럼 대화 기록 전체의 mood 점수만 일괄 계산하는 경우
+    history = make_messages(args.messages, 1, 20, seed=2)
+    legacy_scores = lambda data: [sum(1 for kw in MOOD_KEYWORDS if kw in m) for m in data]
+    assert legacy_scores(history) == score_messages(history)
+
+    old = best_of(legacy_scores, history, args.repeat)
+    new = best_of(score_messages, history, args.repeat)
+    print(f"{'기록 일괄(mood)':<14} {len(history):>6}건  기존 {old:8.1f}ms  매처 {new:8.1f}ms  x{old / new:.1f}")
+
+
+if __name__ == "__main__":
+    main()
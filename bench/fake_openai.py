@@ -0,0 +1,175 @@
+"""로컬 가짜 OpenAI Responses API 서버 (부하 테스트용, 실제 쿼터를 쓰지 않음).
+
+    python bench/fake_openai.py --port 18081 --latency 0.8 --jitter 0.2
+
+POST /v1/responses 만 흉내 낸다. 답변은 입력 문장으로 결정되는 고정 문구라서
+같은 입력이면 항상 같은 답이 나온다. "stream": true 요청에는 SSE 이벤트
+(response.created → response.output_text.delta … → response.completed)로 답한다.
+
+앱을 이 서버에 붙이려면 OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 로 띄우거나,
+같은 프로세스라면 chat_logic.client = OpenAI(base_url=..., api_key="bench") 로 바꿔 끼운다.
+"""
+import argparse, hashlib, itertools, json, random, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLIES = [
+    "헐 진짜? 그래서 기분은 어땠어?",
+    "오~ 그거 재밌었겠다ㅋㅋ 또 뭐 했어?",
+    "에구ㅠㅠ 많이 힘들었겠다. 요즘 자주 그래?",
+    "ㄹㅇ 에바다… 그때 무슨 생각 들었어?",
+    "그랬구나~ 오늘 밥은 잘 먹었어?",
+    "우와 대박ㅋㅋ 너 진짜 열심히 했네!",
+]
+
+
+class FakeOpenAIConfig:
+    def __init__(self, latency=0.5, jitter=0.0, chunks=8, chunk_delay=0.02, seed=0):
+        self.latency = latency  # 첫 바이트까지 기본 지연(초)
+        self.jitter = jitter  # 지연에 더해지는 0~jitter 초 (seed로 결정적)
+        self.chunks = chunks  # 스트리밍 시 답변을 나눌 조각 수
+        self.chunk_delay = chunk_delay  # 조각 사이 지연(초)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.requests = 0
+
+    def next_delay(self):
+        with self._lock:
+            self.requests += 1
+            return self.latency + self._rng.uniform(0, self.jitter)
+
+    def next_id(self):
+        return f"resp_fake_{next(self._ids)}"
+
+
+def reply_for(body):
+    text = json.dumps(body.get("input", ""), ensure_ascii=False, sort_keys=True)
+    digest = int(hashlib.sha1(text.encode()).hexdigest(), 16)
+    return REPLIES[digest % len(REPLIES)]
+
+
+def response_object(response_id, model, text):
+    return {
+        "id": response_id,
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": model,
+        "status": "completed",
+        "output": [
+            {
+                "type": "message",
+                "id": f"msg_{response_id}",
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }
+        ],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {"input_tokens": 0, "output_tokens": len(text), "total_tokens": len(text)},
+    }
+
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # 헤더와 본문을 따로 쓰면 Nagle + delayed ACK로 응답마다 ~40ms가 더해진다
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/responses"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+            time.sleep(config.next_delay())
+
+            text = reply_for(body)
+            obj = response_object(config.next_id(), body.get("model", "gpt-4o-mini"), text)
+            if body.get("stream"):
+                self._stream(obj, text)
+            else:
+                self._json(obj)
+
+        def _json(self, obj):
+            data = json.dumps(obj, ensure_ascii=False).encode()
+            self.send_response(200)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, obj, text):
+            self.send_response(200)
+            self.send_header("content-type", "text/event-stream")
+            self.send_header("connection", "close")
+            self.end_headers()
+
+            seq = itertools.count()
+            size = max(1, -(-len(text) // config.chunks))
+
+            def send(event_type, payload):
+                payload = {"type": event_type, "sequence_number": next(seq), **payload}
+                event = f"event: {event_type}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+                self.wfile.write(event.encode())
+                self.wfile.flush()
+
+            send("response.created", {"response": {**obj, "status": "in_progress", "output": []}})
+            for i in range(0, len(text), size):
+                send(
+                    "response.output_text.delta",
+                    {
+                        "item_id": obj["output"][0]["id"],
+                        "output_index": 0,
+                        "content_index": 0,
+                        "delta": text[i : i + size],
+                        "logprobs": [],
+                    },
+                )
+                time.sleep(config.chunk_delay)
+            send("response.completed", {"response": obj})
+            self.close_connection = True
+
+    return Handler
+
+
+def start_fake_openai(port=0, **config_kwargs):
+    """백그라운드 스레드로 서버를 띄우고 (server, base_url, config)를 돌려준다"""
+    config = FakeOpenAIConfig(**config_kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    return server, base_url, config
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=18081)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--chunks", type=int, default=8)
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server, base_url, _ = start_fake_openai(
+        args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        chunks=args.chunks,
+        chunk_delay=args.chunk_delay,
+        seed=args.seed,
+    )
+    print(f"fake OpenAI listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""부하 테스트: 가짜 OpenAI 서버 + gunicorn으로 띄운 앱을 여러 사용자가 동시에 사용.
+
+    python bench/loadtest.py --users 50 --duration 30 --latency 0.8
+    python bench/loadtest.py --stream --out bench/results/stream.json
+    python bench/loadtest.py --compare bench/results/baseline.json --threshold 20
+    python bench/loadtest.py --target http://127.0.0.1:10000   # 이미 떠 있는 앱 (RSS 측정 없음)
+
+각 가상 사용자는 회원가입 → /login 후 제한 시간 동안
+`/` (히스토리 렌더링) → `/chat` (classify_and_respond) → 가끔 `/analyze`
+(generate_emotion_report)를 반복한다. 경로별 p50/p95/p99 지연, 초당 요청 수,
+워커별 최대 RSS를 출력하고 JSON으로 저장한다. 앱이 과부하 보호로 돌려준 429/503은
+지연 · 처리량에 넣지 않고 거절(rej)로 따로 센다. --compare로 이전 결과와 비교하면
+p95나 처리량이 --threshold % 이상 나빠졌을 때 종료 코드 1을 돌려준다.
+"""
+import argparse, http.client, json, os, platform, shutil, socket, subprocess
+import sys, tempfile, threading, time, urllib.parse
+from collections import defaultdict
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(__file__))
+from fake_openai import start_fake_openai  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+# =========================
+# 🌐 가상 사용자 HTTP 클라이언트
+# =========================
+class UserClient:
+    """쿠키를 직접 들고 다니는 keep-alive 클라이언트 (로컬 http에서도 Secure 쿠키를 보냄)"""
+
+    def __init__(self, host, port, recorder):
+        self.host, self.port = host, port
+        self.recorder = recorder
+        self.cookies = {}
+        self.conn = None
+
+    def request(self, method, path, form=None, route=None, record=True):
+        body = urllib.parse.urlencode(form).encode() if form is not None else None
+        headers = {"Cookie": "; ".join(f"{k}={v}" for k, v in self.cookies.items())}
+        if body is not None:
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+        start = time.perf_counter()
+        status, data = 0, b""
+        for attempt in range(2):
+            # 서버 keepalive 시간이 지나 끊긴 연결이면 한 번만 새로 연결해서 다시 보낸다
+            reused = self.conn is not None
+            try:
+                if self.conn is None:
+                    self.conn = http.client.HTTPConnection(self.host, self.port, timeout=120)
+                self.conn.request(method, path, body=body, headers=headers)
+                resp = self.conn.getresponse()
+                data = resp.read()
+                status = resp.status
+                for cookie in resp.headers.get_all("Set-Cookie") or []:
+                    name, _, value = cookie.split(";", 1)[0].partition("=")
+                    self.cookies[name.strip()] = value.strip()
+                break
+            except (OSError, http.client.HTTPException):
+                self.conn = None
+                if not reused:
+                    break
+        elapsed = time.perf_counter() - start
+
+        if record:
+            self.recorder.add(route or path, elapsed, status)
+        return status, data
+
+
+REJECTED_STATUSES = (429, 503)  # 처리율 제한 · 동시 처리 한도 (admission.py)
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.rejected = defaultdict(int)
+
+    def add(self, route, elapsed, status):
+        with self.lock:
+            if status in REJECTED_STATUSES:
+                # 일을 하지 않고 바로 돌려준 응답이라 지연 분포에 섞으면 결과가 좋아 보이기만 한다
+                self.rejected[route] += 1
+                return
+            self.latencies[route].append(elapsed)
+            if status == 0 or status >= 500:
+                self.errors[route] += 1
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+# =========================
+# 🧠 워커 RSS 측정
+# =========================
+def child_pids(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            if int(fields[1]) == pid:
+                children.append(int(entry))
+        except OSError:
+            continue
+    return children
+
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, master_pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.master_pid = master_pid
+        self.interval = interval
+        self.peak = {}
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            for pid in child_pids(self.master_pid):
+                value = rss_mb(pid)
+                if value is not None:
+                    self.peak[pid] = max(self.peak.get(pid, 0), value)
+            self.stopped.wait(self.interval)
+
+
+# =========================
+# 🚀 앱 띄우기
+# =========================
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(args, openai_base_url, workdir):
+    port = free_port()
+    env = dict(os.environ)
+    env.update(
+        {
+            "PORT": str(port),
+            "WEB_CONCURRENCY": str(args.workers),
+            "OPENAI_API_KEY": "bench",
+            "OPENAI_BASE_URL": openai_base_url,
+            "DATABASE_URL": f"sqlite:///{workdir}/bench.db",
+            "STATE_BACKEND": "sqlite",
+            "STATE_STORE_PATH": f"{workdir}/state.db",
+            "SECRET_KEY": "bench",
+        }
+    )
+    # 사용자당 처리율 제한(기본 분당 20개)과 동시 처리 한도를 풀어 둔다. 가상 사용자는 쉬지 않고
+    # 보내므로 그대로 두면 대부분 429로 끝난다. 한도 자체를 재려면 환경 변수로 직접 지정한다
+    for key, value in {
+        "CHAT_RATE_PER_MINUTE": "1000000",
+        "CHAT_RATE_BURST": "1000000",
+        "CHAT_MAX_ACTIVE": "10000",
+        "CHAT_MAX_QUEUE": "10000",
+    }.items():
+        env.setdefault(key, value)
+    if args.worker_class:
+        env["GUNICORN_WORKER_CLASS"] = args.worker_class
+
+    subprocess.run(
+        [sys.executable, "-m", "flask", "--app", "app", "init-db"],
+        cwd=ROOT, env=env, check=True, capture_output=True,
+    )
+    log = open(os.path.join(workdir, "gunicorn.log"), "w")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--access-logfile", "/dev/null", "app:app"],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return proc, "127.0.0.1", port
+        except OSError:
+            if proc.poll() is not None:
+                break
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"gunicorn did not start, see {workdir}/gunicorn.log")
+
+
+# =========================
+# 🏃 시나리오
+# =========================
+MESSAGES = [
+    "오늘 학교 끝나고 친구랑 떡볶이 먹었어",
+    "요즘 좀 힘들고 피곤해",
+    "시험 공부하느라 잠을 못 잤어",
+    "그냥 그랬어 별일 없었어",
+    "동아리에서 발표했는데 떨렸어",
+]
+
+
+def run_user(index, host, port, recorder, args, barrier, clock, run_id):
+    client = UserClient(host, port, recorder)
+    form = {"username": f"bench_{run_id}_{index}", "password": "bench-pass"}
+    client.request("POST", "/register", form, record=False)
+    client.request("POST", "/login", form, route="/login")
+
+    # 모두 로그인한 뒤부터 측정 시간을 잰다 (회원가입 해싱이 측정 구간을 잡아먹지 않도록)
+    barrier.wait()
+    deadline = clock["start"] + args.duration
+    i = 0
+    while time.time() < deadline:
+        client.request("GET", "/", route="/")
+        message = MESSAGES[(index + i) % len(MESSAGES)]
+        if args.stream:
+            client.request("POST", "/chat/stream", {"message": message}, route="/chat/stream")
+        else:
+            client.request("POST", "/chat", {"message": message}, route="/chat")
+        if i % args.analyze_every == 0:
+            client.request("GET", "/analyze", route="/analyze")
+        i += 1
+        if args.think:
+            time.sleep(args.think)
+
+
+def summarize(recorder, elapsed):
+    routes = {}
+    total = 0
+    for route in sorted(set(recorder.latencies) | set(recorder.rejected)):
+        values = recorder.latencies.get(route, [])
+        total += len(values)
+        routes[route] = {
+            "count": len(values),
+            "errors": recorder.errors.get(route, 0),
+            "rejected": recorder.rejected.get(route, 0),
+            # 모두 거절된 경로는 지연 값이 없다 (None)
+            **{
+                f"p{p}_ms": round(percentile(values, p) * 1000, 1) if values else None
+                for p in (50, 95, 99)
+            },
+            "mean_ms": round(sum(values) / len(values) * 1000, 1) if values else None,
+        }
+    return routes, round(total / elapsed, 2)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(result, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\n📊 {baseline_path} 대비 (임계값 {threshold}%)")
+    regressed = False
+    for route, now in result["routes"].items():
+        before = baseline.get("routes", {}).get(route)
+        if not before or not before["p95_ms"]:
+            continue
+        if now["p95_ms"] is None:
+            regressed = True
+            print(f"❌ {route:<14} 모든 요청이 거절됨 ({now['rejected']}건)")
+            continue
+        change = (now["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+        flag = "❌" if change > threshold else "  "
+        regressed |= change > threshold
+        print(f"{flag} {route:<14} p95 {before['p95_ms']:>8.1f} → {now['p95_ms']:>8.1f}ms ({change:+.1f}%)")
+
+    before_rps = baseline.get("throughput_rps")
+    if before_rps:
+        change = (result["throughput_rps"] - before_rps) / before_rps * 100
+        flag = "❌" if change < -threshold else "  "
+        regressed |= change < -threshold
+        print(f"{flag} {'throughput':<14} {before_rps:>8.2f} → {result['throughput_rps']:>8.2f} req/s ({change:+.1f}%)")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20, help="측정 시간(초)")
+    parser.add_argument("--think", type=float, default=0.0, help="사용자 행동 사이 대기(초)")
+    parser.add_argument("--analyze-every", type=int, default=5)
+    parser.add_argument("--stream", action="store_true", help="/chat 대신 /chat/stream 사용")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--worker-class", default=None, help="gevent | sync (기본: gunicorn.conf.py)")
+    parser.add_argument("--latency", type=float, default=0.5, help="가짜 OpenAI 지연(초)")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--target", default=None, help="이미 떠 있는 앱 주소 (가짜 OpenAI 연결은 직접)")
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--compare", default=None, help="비교할 이전 결과 JSON")
+    parser.add_argument("--threshold", type=float, default=20.0)
+    args = parser.parse_args()
+
+    fake_server, fake_url, fake_config = start_fake_openai(latency=args.latency, jitter=args.jitter)
+    workdir = tempfile.mkdtemp(prefix="kirri-bench-")
+    proc = sampler = None
+    try:
+        if args.target:
+            parsed = urllib.parse.urlparse(args.target)
+            host, port = parsed.hostname, parsed.port or 80
+            print(f"target {args.target} (앱이 OPENAI_BASE_URL={fake_url} 를 쓰도록 띄워야 함)")
+        else:
+            proc, host, port = start_app(args, fake_url, workdir)
+            sampler = RssSampler(proc.pid)
+            sampler.start()
+
+        recorder = Recorder()
+        run_id = int(time.time())
+        clock = {}
+        barrier = threading.Barrier(args.users, action=lambda: clock.update(start=time.time()))
+        threads = [
+            threading.Thread(
+                target=run_user, args=(i, host, port, recorder, args, barrier, clock, run_id)
+            )
+            for i in range(args.users)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.time() - clock["start"]
+    finally:
+        if sampler:
+            sampler.stopped.set()
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=30)
+        fake_server.shutdown()
+
+    routes, rps = summarize(recorder, elapsed)
+    result = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "users": args.users,
+            "duration_s": args.duration,
+            "workers": args.workers,
+            "worker_class": args.worker_class or "gunicorn.conf.py",
+            "stream": args.stream,
+            "openai_latency_s": args.latency,
+            "openai_jitter_s": args.jitter,
+            "target": args.target,
+        },
+        "routes": routes,
+        "throughput_rps": rps,
+        "openai_requests": fake_config.requests,
+        "worker_rss_mb": sorted(round(v, 1) for v in (sampler.peak.values() if sampler else [])),
+    }
+
+    print(f"\n{'route':<14} {'count':>6} {'err':>4} {'rej':>5} {'p50':>8} {'p95':>8} {'p99':>8}  (ms)")
+    for route, r in routes.items():
+        cells = " ".join(f"{r[k]:>8.1f}" if r[k] is not None else f"{'-':>8}" for k in ("p50_ms", "p95_ms", "p99_ms"))
+        print(f"{route:<14} {r['count']:>6} {r['errors']:>4} {r['rejected']:>5} {cells}")
+    print(f"\nthroughput {rps} req/s, OpenAI 호출 {fake_config.requests}회")
+    if result["worker_rss_mb"]:
+        print(f"worker peak RSS (MB): {result['worker_rss_mb']}")
+
+    out = args.out or os.path.join(
+        ROOT, "bench", "results", f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"saved {out}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.compare and compare(result, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""배포 프로필 스모크 검사: gunicorn.conf.py 그대로 앱을 띄우고 /chat을 동시에 보낸다.
+
+    python bench/smoke_gunicorn.py [--users 10] [--latency 1.0] [--workers 2]
+
+가짜 OpenAI(응답 지연 --latency초)에 붙인 `gunicorn -c gunicorn.conf.py app:app`을 띄우고,
+사용자 --users명이 동시에 /chat, 이어서 /chat/stream을 한 번씩 보낸다. 워커마다 첫 요청에
+OpenAI 클라이언트를 만드는 시간이 들어가므로, 측정 전에 /chat을 한 번 더 돌려 데워 둔다.
+  - 모든 응답이 200이고 가짜 OpenAI가 요청 수만큼 호출되었는지
+  - 동시 요청이 워커 수만큼씩이 아니라 한꺼번에 처리되는지 (단계별 소요 < 지연 × 3)
+하나라도 어긋나면 종료 코드 1로 끝난다 (gunicorn.conf.py · gevent 설정을 바꾼 뒤 확인용).
+"""
+import argparse, json, os, shutil, sys, tempfile, threading, time
+
+sys.path.insert(0, os.path.dirname(__file__))
+from fake_openai import start_fake_openai  # noqa: E402
+from loadtest import Recorder, UserClient, start_app  # noqa: E402
+
+
+def burst(clients, path, message):
+    """모든 사용자가 같은 순간에 요청 하나씩 → ([상태 코드], 걸린 시간)"""
+    statuses = [None] * len(clients)
+    barrier = threading.Barrier(len(clients) + 1)
+
+    def send(i, client):
+        barrier.wait()
+        statuses[i], _ = client.request("POST", path, {"message": message}, route=path)
+
+    threads = [threading.Thread(target=send, args=(i, c)) for i, c in enumerate(clients)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    return statuses, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=1.0, help="가짜 OpenAI 지연(초)")
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+    args.worker_class = None  # gunicorn.conf.py 기본값(gevent)을 그대로 검사한다
+
+    fake_server, fake_url, fake_config = start_fake_openai(latency=args.latency, jitter=0)
+    workdir = tempfile.mkdtemp(prefix="kirri-smoke-")
+    proc = None
+    failures = []
+    try:
+        proc, host, port = start_app(args, fake_url, workdir)
+        recorder = Recorder()
+        clients = []
+        for i in range(args.users):
+            client = UserClient(host, port, recorder)
+            form = {"username": f"smoke{i}", "password": "smoke-pass"}
+            client.request("POST", "/register", form, record=False)
+            status, _ = client.request("POST", "/login", form, record=False)
+            if status != 302:
+                failures.append(f"smoke{i} 로그인 실패 ({status})")
+            clients.append(client)
+
+        limit = args.latency * 3
+        for path, measured in (("/chat", False), ("/chat", True), ("/chat/stream", True)):
+            before = fake_config.requests
+            statuses, elapsed = burst(clients, path, "오늘 좀 힘들었어")
+            calls = fake_config.requests - before
+            label = path if measured else f"{path} 예열"
+            print(f"{label:<13} {args.users}건 동시: {elapsed:.2f}s, 상태 {sorted(set(statuses))}, OpenAI 호출 {calls}회")
+            if any(status != 200 for status in statuses):
+                failures.append(f"{path}: 200이 아닌 응답 {statuses}")
+            if calls < args.users:
+                failures.append(f"{path}: OpenAI 호출 {calls}회 < {args.users}회 (gunicorn.log 확인)")
+            if measured and elapsed > limit:
+                failures.append(f"{path}: {elapsed:.2f}s > {limit:.2f}s (요청이 동시에 처리되지 않음)")
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=30)
+        fake_server.shutdown()
+
+    if failures:
+        print("\n❌ " + "\n❌ ".join(failures))
+        print(f"로그: {workdir}/gunicorn.log")
+        sys.exit(1)
+    print(json.dumps({"users": args.users, "workers": args.workers, "latency_s": args.latency}))
+    print("✅ gunicorn.conf.py 프로필 정상")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,43 @@
-import os, re, random
+import os, re, random, threading
 from flask import current_app
-from openai import OpenAI
+from state_store import create_state_store
+from mood import keyword_matcher
+from metrics import span, count_error
+from llm_resilience import CircuitBreaker, ResilientCaller, is_retryable
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-response_id_store = {}
+# OpenAI 클라이언트는 import 비용이 커서 첫 호출 때 만든다 (테스트/벤치에서는 직접 바꿔 끼워도 됨)
+client = None
+
+
+def get_client():
+    global client
+    if client is None:
+        from openai import OpenAI
+
+        # 재시도는 아래 llm(ResilientCaller)이 맡으므로 SDK 자체 재시도는 끈다
+        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    return client
+
+
+# LLM 호출 보호: 시도당 제한 시간, 지터 재시도, 회로 차단기, (선택) 헤징
+llm = ResilientCaller(
+    timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "15")),
+    retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+    deadline=float(os.getenv("LLM_DEADLINE_SECONDS", "30")),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+        reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30")),
+    ),
+    hedge=os.getenv("LLM_HEDGE") == "1",
+    hedge_delay=float(os.getenv("LLM_HEDGE_DELAY_SECONDS", "2")),
+)
+
+# LLM이 응답하지 못할 때 보여줄 친구 말투의 답 (예외 내용은 로그로만 남긴다)
+FALLBACK_REPLY = "앗 미안ㅠㅠ 나 지금 머리가 잠깐 멍해… 조금 있다가 다시 말 걸어줄래?"
+
+
+# 대화 요약과 PHQ 진행 상황은 워커 간 공유 저장소에 둔다
+state_store = create_state_store()
 
 # --- [수정됨] SYSTEM_PROMPT (새로운 '끼리 AI 대화 지침' 적용) ---
 SYSTEM_PROMPT = """
@@ -94,6 +128,9 @@ SYSTEM_PROMPT = """
 사용자 메시지: """
 # --- [수정 끝] ---
 
+# 시스템 프롬프트는 매 요청 같은 instructions로 보낸다 (앞부분이 같아야 프롬프트 캐시가 맞는다)
+INSTRUCTIONS = SYSTEM_PROMPT.strip().removesuffix("사용자 메시지:").rstrip()
+
 
 # =========================
 # 💭 PHQ-A 문항 정의
@@ -110,49 +147,29 @@ PHQ_ITEMS = [
     "혹시 죽고 싶거나 사라지고 싶다는 생각이 든 적 있어?",
 ]
 
-phq_state = {}  # user_id → {"index":int, "score":int, "done":bool}
+# PHQ 진행 상황: state_store["phq:{user_id}"] → {"index":int, "score":int, "done":bool}
 
 
 # =========================
 # 🧮 PHQ 점수화 함수
 # =========================
 def classify_phq_response(text: str) -> int:
-    t = text.lower()
-    if re.search(r"(전혀|없|괜찮|안 그래|별로 아님|거의 없|드물|잘 안)", t):
-        return 0
-    if re.search(r"(가끔|며칠|조금|약간|때때로|간혹)", t):
-        return 1
-    if re.search(r"(자주|종종|절반|많이|꽤|종일|하루의 절반)", t):
-        return 2
-    if re.search(r"(매일|맨날|항상|늘|매번|하루종일|계속|매 순간)", t):
-        return 3
-    return 1
+    # 낮은 점수 표현이 먼저 잡히던 기존 정규식 순서와 같게, 걸린 단계 중 가장 낮은 값
+    hits = keyword_matcher.match(text.lower())
+    levels = [level for level in range(4) if f"phq{level}" in hits]
+    return min(levels) if levels else 1
 
 
 # =========================
 # 💬 감정 키워드 기반 확률 조절
 # =========================
-positive_words = ["좋아", "괜찮", "행복", "편해", "재밌", "신나", "기분 좋", "웃겼"]
-negative_words = [
-    "힘들",
-    "피곤",
-    "우울",
-    "지쳤",
-    "짜증",
-    "불안",
-    "걱정",
-    "귀찮",
-    "슬퍼",
-    "죽고 싶",
-]
-
-
 def get_phq_probability(user_input):
     """사용자 문장에 따라 PHQ 질문 확률 가중치 계산"""
     prob = 0.15  # 기본 확률 25%
-    if any(w in user_input for w in negative_words):
+    hits = keyword_matcher.match(user_input)
+    if "negative" in hits:
         prob += 0.4
-    elif any(w in user_input for w in positive_words):
+    elif "positive" in hits:
         prob -= 0.15
     return min(max(prob, 0.1), 0.8)  # 0.1~0.8 사이로 제한
 
@@ -162,14 +179,15 @@ def get_phq_probability(user_input):
 # =========================
 def maybe_insert_phq(user_input, user_id):
     """일상 대화 중 확률적으로 PHQ 문항을 자연스럽게 삽입"""
-    ctx = phq_state.get(user_id, {"index": 0, "score": 0, "done": False})
+    key = f"phq:{user_id}"
+    ctx = state_store.get(key) or {"index": 0, "score": 0, "done": False}
     if ctx["done"]:
         return None
 
     idx = ctx["index"]
     if idx >= len(PHQ_ITEMS):
         ctx["done"] = True
-        phq_state[user_id] = ctx
+        state_store.set(key, ctx)
         return None
 
     # 확률 계산
@@ -177,7 +195,7 @@ def maybe_insert_phq(user_input, user_id):
     if random.random() < prob:
         q = PHQ_ITEMS[idx]
         ctx["index"] += 1
-        phq_state[user_id] = ctx
+        state_store.set(key, ctx)
         prefix = random.choice(
             [
                 "근데 말이야,",
@@ -198,41 +216,202 @@ def maybe_insert_phq(user_input, user_id):
 # =========================
 # ✨ GPT 기반 자연 대화
 # =========================
-def classify_and_respond(user_input, user_id=None):
-    # ✅ import를 함수 안으로 이동시켜 순환 참조 방지
-    from app import db, ChatLog
+REPORT_REPLY = "리포트는 자동으로 만들어져! 상단의 ‘리포트’ 버튼을 눌러 확인해봐 😊"
+
 
+def is_report_request(user_input):
+    return re.search(r"(리포트|보고서|결과|점수|분석)", user_input) is not None
+
+
+# =========================
+# 🧾 대화 맥락 구성 (토큰 예산 + 롤링 요약)
+# =========================
+# previous_response_id로 이어 붙이면 서버 쪽 맥락이 끝없이 길어지므로,
+# 저장된 ChatLog에서 최근 대화를 예산만큼만 골라 매번 새로 보낸다.
+# 예산 밖으로 밀려난 대화는 state_store["summary:{user_id}"]의 요약에 접어 넣는다.
+#   {"text": 요약, "upto": 요약에 반영된 마지막 ChatLog id}
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_HISTORY_LIMIT = int(os.getenv("CONTEXT_HISTORY_LIMIT", "100"))
+SUMMARY_REFRESH_MESSAGES = int(os.getenv("SUMMARY_REFRESH_MESSAGES", "10"))
+SUMMARY_MAX_CHARS = 400
+
+SUMMARY_INSTRUCTIONS = (
+    "너는 고등학생과 친구처럼 대화하는 챗봇의 대화 기록을 정리하는 역할이야. "
+    "기존 요약과 새 대화를 합쳐서, 다음 대화에 필요한 사실(있었던 일, 감정, 그 이유와 지속 기간, "
+    "이미 물어본 질문)만 300자 이내의 한국어 문장으로 요약해. 진단이나 평가는 쓰지 마."
+)
+
+
+def estimate_tokens(text):
+    """대략적인 토큰 수. 한글은 글자당 1토큰 안팎이라 보수적으로 글자 수를 쓴다"""
+    return len(text) + 4  # 메시지마다 붙는 역할 표시 등 오버헤드
+
+
+def _to_turn(log):
+    role = "assistant" if log["role"] == "bot" else "user"
+    return {"role": role, "content": log["message"]}
+
+
+def build_context(user_input, user_id, history):
+    """history(시간순 ChatLog 목록: id/role/message)에서 예산 안의 최근 대화를 고른다.
+    (요약 텍스트, 최근 대화 목록)을 돌려주고, 밀려난 대화가 쌓였으면 요약 갱신을 예약한다"""
+    summary = state_store.get(f"summary:{user_id}") or {"text": "", "upto": 0}
+    logs = [
+        log
+        for log in history or []
+        if log["id"] > summary["upto"]
+        and log["message"]
+        and not log["message"].startswith("⚠️ AI 응답 오류")
+        and log["message"] != FALLBACK_REPLY
+    ]
+
+    budget = CONTEXT_TOKEN_BUDGET - estimate_tokens(user_input) - estimate_tokens(summary["text"])
+    start = len(logs)
+    while start > 0:
+        cost = estimate_tokens(logs[start - 1]["message"])
+        if cost > budget:
+            break
+        budget -= cost
+        start -= 1
+
+    overflow = logs[:start]
+    if len(overflow) >= SUMMARY_REFRESH_MESSAGES:
+        schedule_summary_refresh(user_id, summary, overflow)
+    return summary["text"], [_to_turn(log) for log in logs[start:]]
+
+
+_summarizing = set()
+_summarizing_lock = threading.Lock()
+
+
+def schedule_summary_refresh(user_id, summary, overflow):
+    """밀려난 대화를 기존 요약에 합치는 작업을 백그라운드에서 한 번만 실행"""
+    with _summarizing_lock:
+        if user_id in _summarizing:
+            return
+        _summarizing.add(user_id)
+
+    def run():
+        try:
+            with span("summary"):
+                refresh_summary(user_id, summary, overflow)
+        except Exception as e:
+            count_error("summary")
+            print(f"Summary refresh failed: {e}")
+        finally:
+            with _summarizing_lock:
+                _summarizing.discard(user_id)
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def refresh_summary(user_id, summary, overflow):
+    lines = [
+        f"{'챗봇' if log['role'] == 'bot' else '사용자'}: {log['message']}" for log in overflow
+    ]
+    res = llm.call(
+        lambda timeout: get_client().responses.create(
+            model="gpt-4o-mini",
+            instructions=SUMMARY_INSTRUCTIONS,
+            input=f"기존 요약: {summary['text'] or '(없음)'}\n\n새 대화:\n" + "\n".join(lines),
+            store=False,
+            timeout=timeout,
+        ),
+        hedge=False,
+    )
+    text = res.output_text.strip()[:SUMMARY_MAX_CHARS]
+    state_store.set(f"summary:{user_id}", {"text": text, "upto": overflow[-1]["id"]})
+
+
+def reset_context(user_id):
+    """대화 초기화 시 요약도 함께 지운다"""
+    state_store.delete(f"summary:{user_id}")
+
+
+def build_request_params(user_input, user_id, history=None):
+    """instructions(고정) + 요약 + 예산 안의 최근 대화 + 이번 메시지로 요청 구성"""
+    summary, turns = build_context(user_input, user_id, history)
+    input_items = []
+    if summary:
+        input_items.append({"role": "developer", "content": f"지금까지의 대화 요약: {summary}"})
+    input_items += turns
+    input_items.append({"role": "user", "content": user_input})
+    return {
+        "model": "gpt-4o-mini",
+        "instructions": INSTRUCTIONS,
+        "input": input_items,
+        "store": False,  # 대화는 ChatLog에서 다시 만들므로 서버에 응답을 남길 필요가 없다
+    }
+
+
+def classify_and_respond(user_input, user_id=None, history=None):
     # 리포트 직접 요청
-    if re.search(r"(리포트|보고서|결과|점수|분석)", user_input):
-        return "리포트는 자동으로 만들어져! 상단의 ‘리포트’ 버튼을 눌러 확인해봐 😊"
+    if is_report_request(user_input):
+        return REPORT_REPLY
 
     # GPT로 일상 대화 생성
     try:
-        previous_id = response_id_store.get(user_id)
-
-        if previous_id is None:
-            first_message = SYSTEM_PROMPT + user_input
-
-            response_request_params = {
-                "model": "gpt-4o-mini",
-                "input": [{"role": "user", "content": first_message}],
-            }
-        else:
-            response_request_params = {
-                "model": "gpt-4o-mini",
-                "input": [{"role": "user", "content": user_input}],
-                "previous_response_id": previous_id,
-            }
-        res = client.responses.create(**response_request_params)
-        response_id_store[user_id] = res.id
+        params = build_request_params(user_input, user_id, history)
+        with span("openai"):
+            res = llm.call(
+                lambda timeout: get_client().responses.create(**params, timeout=timeout)
+            )
         reply = res.output_text.strip()
 
         # ✅ PHQ 문항 확률 삽입
-        phq_extra = maybe_insert_phq(user_input, user_id)
+        with span("phq"):
+            phq_extra = maybe_insert_phq(user_input, user_id)
         if phq_extra:
             reply += f"\n\n{phq_extra}"
 
         return reply
 
     except Exception as e:
-        return f"⚠️ AI 응답 오류: {str(e)}"
+        count_error("ai_response")
+        print(f"AI 응답 오류: {e!r}")
+        return FALLBACK_REPLY
+
+
+# =========================
+# 🌊 스트리밍 응답 (SSE용)
+# =========================
+def stream_and_respond(user_input, user_id=None, history=None):
+    """("delta", 텍스트) 조각을 생성하고, 마지막에 PHQ 문항이 있으면 ("phq", 문항)을 생성"""
+    if is_report_request(user_input):
+        yield "delta", REPORT_REPLY
+        return
+
+    started = False
+    try:
+        params = build_request_params(user_input, user_id, history)
+        # 스트림을 다 받을 때까지의 시간 (클라이언트가 조각을 읽는 시간도 포함)
+        with span("openai"):
+            # 재시도는 스트림 연결까지만 (이미 보낸 조각은 되돌릴 수 없어서 헤징도 하지 않음)
+            stream = llm.call(
+                lambda timeout: get_client().responses.create(
+                    **params, stream=True, timeout=timeout
+                ),
+                hedge=False,
+            )
+            for event in stream:
+                if event.type == "response.output_text.delta":
+                    # 비스트리밍 응답의 strip()과 맞추기 위해 앞쪽 공백은 버림
+                    text = event.delta if started else event.delta.lstrip()
+                    if text:
+                        started = True
+                        yield "delta", text
+    except Exception as e:
+        count_error("ai_response")
+        print(f"AI 응답 오류: {e!r}")
+        if started:
+            # 스트림 도중 끊김: 차단기에 반영하고 받은 데까지만 답으로 쓴다
+            if is_retryable(e):
+                llm.breaker.record_failure()
+            return
+        yield "error", FALLBACK_REPLY
+        return
+
+    with span("phq"):
+        phq_extra = maybe_insert_phq(user_input, user_id)
+    if phq_extra:
+        yield "phq", phq_extra
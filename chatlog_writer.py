@@ -0,0 +1,113 @@
+import atexit, json, threading, time
+from collections import Counter
+
+
+# =========================
+# 📝 ChatLog 지연 쓰기 (write-behind)
+# =========================
+class ChatLogWriter:
+    """대화 저장 요청을 큐에 모았다가 짧은 주기/일정 개수마다 한 트랜잭션으로 저장한다.
+
+    flush_fn(batch)는 [(user_id, entries), ...]를 받아 실제로 DB에 쓰는 함수.
+    - 같은 사용자의 기록을 읽기 전에 sync(user_id)를 부르면 대기 중인 쓰기를 먼저 반영한다.
+      큐는 워커 프로세스마다 따로라서 read-your-writes는 같은 워커 안에서만 보장된다
+      (다른 워커로 간 요청에는 최대 interval만큼 늦게 보일 수 있음).
+    - 저장이 max_retries번 연달아 실패하면 요청을 하나씩 저장해 보고, 그래도 안 되는 것만
+      로그에 남기고 버린다 (잘못된 행 하나 때문에 큐 전체가 영원히 막히지 않도록).
+    - 프로세스 종료 시(atexit, gunicorn worker_exit) close()로 남은 큐를 모두 저장한다.
+    """
+
+    def __init__(self, flush_fn, interval=0.05, max_batch=100, max_retries=5):
+        self.flush_fn = flush_fn
+        self.interval = interval
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self._failures = 0  # 연달아 실패한 저장 횟수
+        self._queue = []
+        self._pending = Counter()  # user_id → 아직 저장 안 된 요청 수
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def submit(self, user_id, entries):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("ChatLogWriter is closed")
+            self._queue.append((user_id, entries))
+            self._pending[user_id] += 1
+            if self._thread is None:
+                # gunicorn이 워커를 fork한 뒤 첫 요청에서 스레드를 띄운다
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+            if len(self._queue) >= self.max_batch:
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._queue:
+                    return
+            # 첫 요청 이후 interval 동안 더 모아서 한 번에 저장
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                time.sleep(1)  # DB 장애 시 잠시 쉬었다가 재시도
+
+    def flush(self):
+        """대기 중인 쓰기를 지금 바로 저장"""
+        with self._flush_lock:
+            with self._cond:
+                batch, self._queue = self._queue, []
+            if not batch:
+                return
+            try:
+                self.flush_fn(batch)
+            except Exception as e:
+                self._failures += 1
+                if self._failures < self.max_retries:
+                    print(f"ChatLog flush failed ({self._failures}/{self.max_retries}), will retry: {e}")
+                    with self._cond:
+                        self._queue[:0] = batch
+                    raise
+                self._flush_each(batch)
+            self._failures = 0
+            with self._cond:
+                for user_id, _ in batch:
+                    self._pending[user_id] -= 1
+                    if self._pending[user_id] <= 0:
+                        del self._pending[user_id]
+
+    def _flush_each(self, batch):
+        for item in batch:
+            try:
+                self.flush_fn([item])
+            except Exception as e:
+                dropped = json.dumps(item, ensure_ascii=False, default=str)
+                print(f"ChatLog dropped after {self.max_retries} failed flushes: {e} {dropped}")
+
+    def sync(self, user_id):
+        """해당 사용자의 대기 중인 쓰기가 있으면 먼저 저장 (read-your-writes)"""
+        if self._pending.get(user_id):
+            self.flush()
+
+    def close(self):
+        """남은 큐를 비울 때까지 저장한다. 종료 때는 다른 워커도 한꺼번에 쓰느라 잠금에 걸리기
+        쉬워서 잠깐씩 쉬며 다시 시도하고, max_retries번 실패하면 하나씩 저장하거나 로그로 남긴다"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        while True:
+            with self._cond:
+                if not self._queue:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                time.sleep(min(1.0, 0.1 * self._failures))
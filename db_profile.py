@@ -0,0 +1,98 @@
+import os, threading
+from contextlib import nullcontext
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# =========================
+# 🗄️ DB 연결 프로필 (SQLite / PostgreSQL)
+# =========================
+# SQLite 기본 설정(rollback journal + synchronous=FULL)에서는 쓰는 동안 읽기까지 막혀서
+# gunicorn 워커 여러 개가 동시에 커밋하면 "database is locked"로 멈춘다. 연결마다 아래
+# PRAGMA를 걸어서 읽기는 쓰기를 막지 않고(WAL), 쓰기끼리는 잠깐 기다렸다 이어서 하게 한다.
+#
+#   DB_PROFILE             auto | off (기본 auto, off는 예전 설정 그대로 — 벤치마크 비교용)
+#   DB_POOL_SIZE           워커당 유지하는 연결 수 (기본 SQLite 10, PostgreSQL 5)
+#   DB_MAX_OVERFLOW        몰릴 때 잠깐 더 여는 연결 수 (기본 SQLite 20, PostgreSQL 10)
+#   DB_POOL_TIMEOUT        연결을 기다리는 최대 시간(초, 기본 10)
+#   DB_POOL_RECYCLE        PostgreSQL 연결을 새로 여는 주기(초, 기본 1800)
+#   SQLITE_BUSY_TIMEOUT_MS 쓰기 잠금을 기다리는 시간 (기본 5000)
+#   SQLITE_CACHE_SIZE_KB   연결당 페이지 캐시 (기본 65536 = 64MB)
+#   SQLITE_MMAP_SIZE       메모리 맵으로 읽을 크기(바이트, 기본 268435456 = 256MB)
+#
+# PostgreSQL은 워커 수 × (DB_POOL_SIZE + DB_MAX_OVERFLOW)가 서버 max_connections보다
+# 작아야 한다. /chat은 LLM을 기다리는 동안 연결을 반납하므로 워커당 몇 개면 충분하다.
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # WAL에서는 커밋이 빨라지고, 전원이 꺼져도 DB가 깨지지는 않는다
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")),  # 음수 = KB 단위
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+}
+
+
+def profile_enabled():
+    return os.getenv("DB_PROFILE", "auto") != "off"
+
+
+def normalize_database_url(url):
+    """Render 등이 주는 postgres:// 주소를 SQLAlchemy가 아는 postgresql://로 바꾼다"""
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def is_memory_sqlite(url):
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+
+def engine_options(url):
+    """SQLALCHEMY_ENGINE_OPTIONS (연결 풀 크기 등)"""
+    if not profile_enabled():
+        return {"pool_pre_ping": True}
+
+    if url.startswith("sqlite"):
+        if is_memory_sqlite(url):
+            return {}  # 메모리 DB는 연결 하나를 공유하는 전용 풀을 그대로 쓴다
+        # 파일 DB는 네트워크 연결이 아니라 끊길 일이 없어서 pre_ping(체크아웃마다 SELECT 1)을 뺀다
+        return {
+            "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+            "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+            "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        }
+
+    return {
+        "pool_pre_ping": True,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    }
+
+
+@event.listens_for(Engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """SQLite 연결이 새로 열릴 때마다 PRAGMA 적용 (풀에서 재사용되는 연결은 그대로 유지)"""
+    if not profile_enabled() or type(dbapi_connection).__module__ != "sqlite3":
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+# SQLite는 파일 전체에 쓰기 잠금이 하나뿐이라, 같은 워커의 스레드/그린렛끼리 잠금을 두고
+# 다투면 busy 핸들러가 점점 길게 잠들면서(최대 100ms씩) 꼬리 지연이 커진다.
+# 워커 안에서는 쓰기 트랜잭션을 먼저 줄 세우고, 워커끼리만 busy_timeout으로 기다리게 한다.
+_sqlite_write_lock = threading.Lock()
+
+
+def write_lock(url):
+    """쓰기 트랜잭션을 감쌀 잠금 (SQLite 파일 DB에서만, 그 외에는 아무것도 안 함)"""
+    if profile_enabled() and url.startswith("sqlite") and not is_memory_sqlite(url):
+        return _sqlite_write_lock
+    return nullcontext()
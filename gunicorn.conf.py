@@ -0,0 +1,50 @@
+# =========================
+# 🚀 gunicorn 배포 프로필
+# =========================
+# /chat 요청 시간의 대부분은 OpenAI 응답을 기다리는 네트워크 대기라서,
+# 요청 하나가 프로세스 하나를 통째로 잡는 기본 sync 워커 대신
+# gevent 협력형 워커를 쓴다. gevent가 소켓을 몽키패치하므로 동기 OpenAI
+# 클라이언트 호출도 대기 중에는 다른 요청에 양보하고, 워커 하나가
+# worker_connections 개의 대화를 그린렛(수 KB)으로 동시에 처리한다.
+#
+#   gunicorn -c gunicorn.conf.py app:app
+#   python bench/smoke_gunicorn.py   # 설정을 바꾼 뒤 이 프로필로 동시 /chat이 도는지 확인
+#
+# 환경변수
+#   PORT                         바인드 포트 (기본 10000)
+#   WEB_CONCURRENCY              워커 프로세스 수 (기본 2)
+#   GUNICORN_WORKER_CLASS        gevent | sync (기본 gevent, 디버깅할 때만 sync)
+#   GUNICORN_WORKER_CONNECTIONS  워커당 동시 요청 수 (기본 500)
+#   GUNICORN_TIMEOUT             워커 무응답 판정 시간(초, 기본 120)
+#
+# preload_app은 켜지 않는다. 마스터에서 앱을 먼저 import하면 gevent
+# 몽키패치 전에 ssl/socket 모듈이 로드되어 경고와 교착이 생길 수 있다.
+import os, sys
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gevent")
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "500"))
+
+# SSE 스트리밍 응답이 길어질 수 있어 기본값(30초)보다 넉넉하게 둔다.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+
+
+def post_fork(server, worker):
+    # gevent는 몽키패치하면서 select.epoll을 지운다. 환경에 trio가 깔려 있으면 OpenAI SDK가 쓰는
+    # httpcore가 import 시점에 trio를 불러오다 AttributeError로 죽고, 모든 /chat이 200 +
+    # FALLBACK_REPLY로 끝나서 겉으로는 멀쩡해 보인다. 앱은 trio를 쓰지 않으므로 gevent 워커에서는
+    # import되지 않게 막는다 (httpcore는 ImportError면 trio 없이 동작)
+    if worker_class == "gevent":
+        sys.modules.setdefault("trio", None)
+
+
+def worker_exit(server, worker):
+    # 지연 쓰기(CHATLOG_WRITE_BEHIND) 큐에 남은 대화를 워커 종료 전에 모두 저장
+    app_module = sys.modules.get("app")
+    if app_module is not None and app_module.chatlog_writer is not None:
+        app_module.chatlog_writer.close()
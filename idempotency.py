@@ -0,0 +1,110 @@
+import threading, time
+from metrics import registry
+
+
+# =========================
+# 🔁 중복 전송 합치기 (Idempotency-Key)
+# =========================
+# 모바일에서 연결이 끊겼다 붙거나 클라이언트가 다시 보내면 같은 메시지로 /chat이 여러 번
+# 들어와서 OpenAI 호출과 ChatLog 저장이 그만큼 반복된다. 클라이언트가 메시지마다 붙이는
+# Idempotency-Key로 같은 요청을 알아보고
+#   - 아직 처리 중이면 먼저 온 요청의 결과를 같이 기다렸다가 돌려주고
+#   - 이미 끝났으면 ttl 동안 저장해 둔 답변을 그대로 다시 돌려준다.
+# 같은 워커 안에서는 정확히 한 번만 처리한다. 워커끼리는 상태 저장소의 "처리 중" 표시를
+# 보고 기다리는 방식이라 거의 동시에 다른 워커로 들어온 중복은 드물게 둘 다 처리될 수 있다.
+
+idempotency_lookups = registry.counter(
+    "kirri_idempotency_total", "Idempotency-Key 요청 처리 결과", ("result",)
+)
+
+MAX_KEY_LENGTH = 128
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class IdempotentRequests:
+    """begin()이 ("replay", 답변) / ("owner", 토큰) 중 하나를 돌려준다.
+    owner는 처리가 끝나면 finish(토큰, 답변), 실패하면 fail(토큰, 예외)를 부른다."""
+
+    def __init__(self, store, ttl=600, wait_timeout=45.0, pending_ttl=60, poll_interval=0.2):
+        self.store = store
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self.pending_ttl = pending_ttl  # 처리하던 워커가 죽어도 이 시간이 지나면 다시 받을 수 있다
+        self.poll_interval = poll_interval
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def begin(self, user_id, key):
+        full_key = f"idem:{user_id}:{key}"
+        with self._lock:
+            flight = self._flights.get(full_key)
+            if flight is None:
+                record = self.store.get(full_key)
+                if record is None:
+                    self._flights[full_key] = _Flight()
+                    self.store.set(full_key, {"pending": True}, ttl=self.pending_ttl)
+                    idempotency_lookups.inc(result="new")
+                    return "owner", full_key
+        if flight is None and "response" in record:
+            idempotency_lookups.inc(result="replayed")
+            return "replay", record["response"]
+
+        idempotency_lookups.inc(result="coalesced")
+        if flight is not None:
+            response = self._wait_local(flight)
+        else:
+            response = self._wait_store(full_key)  # 다른 워커가 처리 중
+        if response is None:
+            # 원래 요청이 중간에 끊겼거나 처리하던 워커가 사라졌다 → 이번 요청이 이어받는다
+            return self.begin(user_id, key)
+        return "replay", response
+
+    def finish(self, token, response):
+        self.store.set(token, {"response": response}, ttl=self.ttl)
+        with self._lock:
+            flight = self._flights.pop(token, None)
+        if flight is not None:
+            flight.response = response
+            flight.done.set()
+
+    def fail(self, token, error=None):
+        """기록을 지워서 같은 키로 다시 시도할 수 있게 한다. 기다리던 중복 요청은
+        error가 있으면 같은 예외를 받고, 없으면(연결이 끊긴 경우 등) 대신 처리를 이어받는다"""
+        self.store.delete(token)
+        with self._lock:
+            flight = self._flights.pop(token, None)
+        if flight is not None:
+            flight.error = error
+            flight.done.set()
+
+    def _wait_local(self, flight):
+        if not flight.done.wait(self.wait_timeout):
+            raise TimeoutError("duplicate request waited too long for the original")
+        if flight.error is not None:
+            raise flight.error
+        return flight.response  # 버려진 요청이면 None
+
+    def _wait_store(self, full_key):
+        give_up_at = time.monotonic() + self.wait_timeout
+        while time.monotonic() < give_up_at:
+            time.sleep(self.poll_interval)
+            record = self.store.get(full_key)
+            if record is None:
+                return None
+            if "response" in record:
+                return record["response"]
+        raise TimeoutError("duplicate request waited too long for the original")
+
+
+def request_key(headers):
+    """Idempotency-Key 헤더 값 (없거나 너무 길면 None)"""
+    key = headers.get("Idempotency-Key", "").strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return None
+    return key
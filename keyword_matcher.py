@@ -0,0 +1,85 @@
+import re
+from collections import defaultdict
+
+
+# =========================
+# 🔎 다중 키워드 매처
+# =========================
+class KeywordMatcher:
+    """여러 카테고리의 키워드를 정규식 하나로 컴파일해서 텍스트를 한 번만 훑는다.
+
+    categories: {카테고리: [키워드, ...] 또는 {키워드: 가중치}}
+    match(text)는 {카테고리: 가중치 합}을 돌려준다. 같은 키워드는 몇 번 나와도 한 번만 센다
+    (기존 `kw in text` 방식과 같은 의미). 돌려준 dict는 캐시와 공유되므로 수정하지 않는다.
+    """
+
+    CACHE_SIZE = 4096  # 키워드 조합 → 점수 캐시 크기
+
+    def __init__(self, categories):
+        self._weights = defaultdict(list)  # 키워드 → [(카테고리, 가중치), ...]
+        for category, keywords in categories.items():
+            if not isinstance(keywords, dict):
+                keywords = {kw: 1 for kw in keywords}
+            for kw, weight in keywords.items():
+                self._weights[kw].append((category, weight))
+
+        # 같은 위치에서는 긴 키워드가 먼저 잡히도록 길이 역순으로 나열
+        keywords = sorted(self._weights, key=len, reverse=True)
+        self._regex = re.compile("|".join(map(re.escape, keywords)))
+        self._findall = self._regex.findall
+        self._cache = {}
+
+        # 긴 키워드가 잡히면 그 안에 들어 있는 짧은 키워드도 함께 등장한 것
+        self._implied = {
+            kw: frozenset(other for other in keywords if other in kw) for kw in keywords
+        }
+        # 끝부분이 다른 키워드의 시작과 겹칠 수 있는 키워드 (예: "잘 안" + "안 그래")
+        self._overlapping = frozenset(
+            kw
+            for kw in keywords
+            for i in range(1, len(kw))
+            if any(other.startswith(kw[i:]) and len(other) > len(kw) - i for other in keywords)
+        )
+
+    def _find_overlapping(self, text):
+        # 겹치는 키워드가 있을 때만 매치 시작 위치 바로 다음부터 다시 찾는다
+        search = self._regex.search
+        found, pos = set(), 0
+        while True:
+            m = search(text, pos)
+            if m is None:
+                return found
+            found.add(m.group())
+            pos = m.start() + 1
+
+    _EMPTY = {}
+
+    def match(self, text):
+        """{카테고리: 가중치 합} (걸린 카테고리만 포함)"""
+        if not text:
+            return self._EMPTY
+        found = frozenset(self._findall(text))
+        if not found:
+            return self._EMPTY
+        if found & self._overlapping:
+            found = frozenset(self._find_overlapping(text))
+
+        # 대화에 나오는 키워드 조합은 많지 않아서, 조합별 점수를 캐시해 둔다
+        result = self._cache.get(found)
+        if result is None:
+            hits = set()
+            for kw in found:
+                hits |= self._implied[kw]
+            result = {}
+            for kw in hits:
+                for category, weight in self._weights[kw]:
+                    result[category] = result.get(category, 0) + weight
+            if len(self._cache) >= self.CACHE_SIZE:
+                self._cache.clear()
+            self._cache[found] = result
+        return result
+
+    def match_many(self, texts):
+        """여러 메시지를 한 번에 점수화 (대화 기록 일괄 처리용)"""
+        match = self.match
+        return [match(text) for text in texts]
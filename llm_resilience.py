@@ -0,0 +1,168 @@
+import random, threading, time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from metrics import registry
+
+llm_events = registry.counter(
+    "kirri_llm_events_total", "LLM 호출 재시도/헤징/차단 이벤트 수", ("event",)
+)
+
+
+class CircuitOpenError(Exception):
+    """차단기가 열려 있어서 LLM을 호출하지 않고 바로 실패"""
+
+
+# =========================
+# 🔌 회로 차단기
+# =========================
+class CircuitBreaker:
+    """연속 실패가 failure_threshold번 쌓이면 reset_timeout초 동안 호출을 막는다.
+    시간이 지나면 한 요청만 시험 삼아 보내고(half-open), 성공하면 다시 닫는다.
+    상태는 워커 프로세스마다 따로 가진다."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                return False
+            self._probing = True  # half-open: 시험 요청 하나만 통과
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    llm_events.inc(event="circuit_open")
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+# =========================
+# 🛡️ 타임아웃 · 재시도 · 헤징
+# =========================
+def is_retryable(exc):
+    """연결 오류/타임아웃, 408·409·429, 5xx만 재시도 (요청 자체가 잘못된 4xx는 바로 실패)"""
+    from openai import APIConnectionError, APIStatusError
+
+    if isinstance(exc, APIConnectionError):  # APITimeoutError 포함
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code in (408, 409, 429) or exc.status_code >= 500
+    return False
+
+
+def _retry_after(exc):
+    response = getattr(exc, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class ResilientCaller:
+    """call(fn)은 fn(timeout)을 시도당 제한 시간, 지터 백오프 재시도, 회로 차단기로 감싸서 호출한다.
+
+    hedge=True면 한 시도가 최근 p95 지연보다 오래 걸릴 때 같은 요청을 하나 더 보내고
+    먼저 끝난 쪽을 쓴다 (늦은 쪽은 결과만 버림).
+    """
+
+    def __init__(
+        self,
+        timeout=15.0,
+        retries=2,
+        deadline=30.0,
+        backoff=0.5,
+        backoff_cap=4.0,
+        breaker=None,
+        hedge=False,
+        hedge_delay=2.0,
+        hedge_workers=32,
+    ):
+        self.timeout = timeout
+        self.retries = retries
+        self.deadline = deadline
+        self.backoff = backoff
+        self.backoff_cap = backoff_cap
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay  # 지연 표본이 적을 때 쓰는 기본 헤징 대기 시간
+        self._latencies = deque(maxlen=200)
+        self._executor = ThreadPoolExecutor(hedge_workers) if hedge else None
+
+    def call(self, fn, hedge=None):
+        if not self.breaker.allow():
+            llm_events.inc(event="short_circuit")
+            raise CircuitOpenError("LLM circuit is open")
+
+        hedge = self.hedge if hedge is None else hedge
+        give_up_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            remaining = give_up_at - time.monotonic()
+            timeout = max(0.1, min(self.timeout, remaining))
+            start = time.monotonic()
+            try:
+                result = self._hedged(fn, timeout) if hedge else fn(timeout)
+            except Exception as e:
+                retryable = is_retryable(e)
+                if retryable:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()  # 업스트림은 응답했다 (요청 쪽 문제)
+                delay = _retry_after(e) or random.uniform(
+                    0, min(self.backoff_cap, self.backoff * 2**attempt)
+                )
+                out_of_time = time.monotonic() + delay >= give_up_at
+                if not retryable or attempt >= self.retries or out_of_time:
+                    raise
+                if not self.breaker.allow():
+                    raise CircuitOpenError("LLM circuit opened during retries") from e
+                llm_events.inc(event="retry")
+                attempt += 1
+                time.sleep(delay)
+                continue
+
+            self._latencies.append(time.monotonic() - start)
+            self.breaker.record_success()
+            return result
+
+    def p95(self):
+        if len(self._latencies) < 20:
+            return self.hedge_delay
+        ordered = sorted(self._latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def _hedged(self, fn, timeout):
+        first = self._executor.submit(fn, timeout)
+        done, _ = wait([first], timeout=min(self.p95(), timeout))
+        if done:
+            return first.result()
+
+        llm_events.inc(event="hedge")
+        pending = {first, self._executor.submit(fn, timeout)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        llm_events.inc(event="hedge_won")
+                    return future.result()
+                error = future.exception()
+        raise error
@@ -0,0 +1,248 @@
+import os, threading, time
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# =========================
+# 📈 계측 (Prometheus 텍스트 형식)
+# =========================
+# 값은 워커 프로세스마다 따로 쌓인다. gunicorn 워커가 여러 개면 /metrics는 요청을 받은
+# 워커의 값만 보여주므로 pid 라벨로 구분한다 (Prometheus에서 sum by로 합쳐서 본다).
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self, const_labels):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            labels = const_labels + list(zip(self.labelnames, key))
+            lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def collect(self, const_labels):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            labels = const_labels + list(zip(self.labelnames, key))
+            lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # 라벨 → [버킷별 개수..., 합계, 개수]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def collect(self, const_labels):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in items:
+            labels = const_labels + list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                bucket_labels = labels + [("le", repr(float(bound)))]
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f'{self.name}_bucket{_format_labels(labels + [("le", "+Inf")])} {state[-1]}')
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {state[-2]:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {state[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, *args, **kwargs):
+        metric = Gauge(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        const_labels = [("pid", os.getpid())]
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.collect(const_labels))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "kirri_http_requests_total", "HTTP 요청 수", ("route", "method", "status")
+)
+http_latency = registry.histogram(
+    "kirri_http_request_duration_seconds", "라우트별 응답 시간(초)", ("route", "method")
+)
+stage_latency = registry.histogram(
+    "kirri_stage_duration_seconds", "요청 안의 단계별 소요 시간(초)", ("stage",)
+)
+errors = registry.counter("kirri_errors_total", "종류별 오류 수", ("kind",))
+db_queries = registry.counter("kirri_db_queries_total", "라우트별 DB 쿼리 수", ("route",))
+
+
+def current_route():
+    if not has_request_context():
+        return "background"  # 지연 쓰기 스레드 등 요청 밖에서 실행된 작업
+    rule = request.url_rule
+    return rule.rule if rule is not None else "unmatched"
+
+
+def _record_timing(name, elapsed):
+    """Server-Timing 헤더용으로 이번 요청의 단계별 시간을 모은다"""
+    if has_request_context():
+        timings = g.setdefault("timings", {})
+        timings[name] = timings.get(name, 0) + elapsed
+
+
+@contextmanager
+def span(stage):
+    """with span("openai"): ... 구간의 시간을 단계별 히스토그램과 Server-Timing에 기록"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_latency.observe(elapsed, stage=stage)
+        _record_timing(stage, elapsed)
+
+
+def count_error(kind):
+    errors.inc(kind=kind)
+
+
+# =========================
+# 🗄️ DB 쿼리 수 · 시간
+# =========================
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    db_queries.inc(route=current_route())
+    stage_latency.observe(elapsed, stage="db")
+    _record_timing("db", elapsed)
+    if has_request_context():
+        g.db_query_count = g.get("db_query_count", 0) + 1
+
+
+# =========================
+# 🌐 Flask 연동
+# =========================
+def init_app(app):
+    """요청마다 시간을 재고, SERVER_TIMING=1이면 Server-Timing 헤더를 붙인다"""
+    server_timing = os.getenv("SERVER_TIMING") == "1"
+
+    @app.before_request
+    def _start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.get("request_start")
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        route = current_route()
+        http_latency.observe(elapsed, route=route, method=request.method)
+        http_requests.inc(route=route, method=request.method, status=response.status_code)
+
+        if server_timing:
+            # 스트리밍 응답은 본문을 보내기 전에 헤더가 나가므로 그때까지의 단계만 담긴다
+            entries = []
+            for name, seconds in g.get("timings", {}).items():
+                entry = f"{name};dur={seconds * 1000:.1f}"
+                if name == "db":
+                    entry += f';desc="{g.get("db_query_count", 0)} queries"'
+                entries.append(entry)
+            entries.append(f"total;dur={elapsed * 1000:.1f}")
+            response.headers["Server-Timing"] = ", ".join(entries)
+        return response
+
+    @app.teardown_request
+    def _count_unhandled(exc):
+        if exc is not None:
+            count_error("unhandled")
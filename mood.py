@@ -0,0 +1,82 @@
+from bisect import bisect_right
+from datetime import timedelta
+from keyword_matcher import KeywordMatcher
+
+
+# =========================
+# 🌡️ 감정 점수 계산
+# =========================
+KST_OFFSET = timedelta(hours=9)
+
+MOOD_KEYWORDS = [
+    "힘들",
+    "우울",
+    "무기력",
+    "짜증",
+    "귀찮",
+    "죽고 싶",
+    "의욕없",
+    "불안",
+]
+
+
+# PHQ 질문 확률 조절용 감정 단어
+POSITIVE_WORDS = ["좋아", "괜찮", "행복", "편해", "재밌", "신나", "기분 좋", "웃겼"]
+NEGATIVE_WORDS = [
+    "힘들",
+    "피곤",
+    "우울",
+    "지쳤",
+    "짜증",
+    "불안",
+    "걱정",
+    "귀찮",
+    "슬퍼",
+    "죽고 싶",
+]
+
+# PHQ 응답 빈도 표현 (0: 전혀 ~ 3: 거의 매일)
+PHQ_FREQUENCY_WORDS = {
+    0: ["전혀", "없", "괜찮", "안 그래", "별로 아님", "거의 없", "드물", "잘 안"],
+    1: ["가끔", "며칠", "조금", "약간", "때때로", "간혹"],
+    2: ["자주", "종종", "절반", "많이", "꽤", "종일", "하루의 절반"],
+    3: ["매일", "맨날", "항상", "늘", "매번", "하루종일", "계속", "매 순간"],
+}
+
+# 리포트 · PHQ 확률 · PHQ 점수화가 함께 쓰는 키워드 매처
+keyword_matcher = KeywordMatcher(
+    {
+        "mood": MOOD_KEYWORDS,
+        "positive": POSITIVE_WORDS,
+        "negative": NEGATIVE_WORDS,
+        **{f"phq{level}": words for level, words in PHQ_FREQUENCY_WORDS.items()},
+    }
+)
+
+
+def score_message(text):
+    """메시지에 등장한 우울 키워드 개수 (같은 키워드는 한 번만 셈)"""
+    return keyword_matcher.match(text).get("mood", 0)
+
+
+# 대화 기록 일괄 점수화는 mood 키워드만 필요하므로 작은 오토마톤을 따로 둔다
+_mood_matcher = KeywordMatcher({"mood": MOOD_KEYWORDS})
+
+
+def score_messages(texts):
+    """여러 메시지의 감정 점수를 한 번에 계산 (백필 · 배치 분석용)"""
+    return [hits.get("mood", 0) for hits in _mood_matcher.match_many(texts)]
+
+
+def kst_date(utc_dt):
+    return (utc_dt + KST_OFFSET).date()
+
+
+# 우울 점수 6단계: 0 / 1~4 / 5~9 / 10~14 / 15~19 / 20 이상 (배치 분석도 같은 경계를 쓴다)
+LEVEL_BOUNDS = (1, 5, 10, 15, 20)
+LEVEL_NAMES = ["정상", "경미한 저하", "약한 우울", "중등도 우울", "심한 우울", "중증 우울"]
+
+
+# 우울 점수를 6단계로 변환하는 함수
+def score_to_level(score):
+    return bisect_right(LEVEL_BOUNDS, score)  # 0: 정상 ~ 5: 중증 우울
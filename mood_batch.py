@@ -0,0 +1,128 @@
+import csv
+from datetime import timedelta
+import numpy as np
+from mood import KST_OFFSET, LEVEL_BOUNDS, LEVEL_NAMES, score_messages
+
+
+# =========================
+# 📊 전체 사용자 감정 추이 배치 분석
+# =========================
+# 요청 처리와 분리된 오프라인 작업 (flask --app app mood-cohort).
+# ChatLog를 한 번의 스트리밍 쿼리로 읽으면서 청크마다 NumPy 배열로 바꿔
+# (사용자 × 날짜) 행렬에 누적한다. ORM 객체를 만들지 않으므로 수십만 건도 몇 초면 끝난다.
+
+
+def levels_of(scores):
+    """score_to_level의 벡터 버전 (같은 LEVEL_BOUNDS 사용)"""
+    return np.searchsorted(np.asarray(LEVEL_BOUNDS), scores, side="right")
+
+
+class MoodCohort:
+    """user_ids(정렬된 전체 사용자 id)와 start_day부터 days일의 KST 일자별 점수/메시지 수 행렬"""
+
+    def __init__(self, user_ids, start_day, days):
+        self.user_ids = np.asarray(sorted(user_ids), dtype=np.int64)
+        self.start_day = start_day
+        self.days = days
+        self._start = np.datetime64(start_day, "D")
+        self.scores = np.zeros((len(self.user_ids), days), dtype=np.int64)
+        self.counts = np.zeros((len(self.user_ids), days), dtype=np.int64)
+
+    def add_chunk(self, rows):
+        """rows: (user_id, timestamp(UTC), mood_score, message) 목록.
+        mood_score가 비어 있는(백필 전) 행만 message로 점수를 계산한다"""
+        if not rows or not len(self.user_ids):
+            return
+        user_ids, timestamps, scores, messages = zip(*rows)
+
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            scores = list(scores)
+            for i, score in zip(missing, score_messages([messages[i] or "" for i in missing])):
+                scores[i] = score
+
+        uid = np.asarray(user_ids, dtype=np.int64)
+        kst = np.asarray(timestamps, dtype="datetime64[s]") + np.timedelta64(KST_OFFSET)
+        day = (kst.astype("datetime64[D]") - self._start).astype(np.int64)
+        row = np.searchsorted(self.user_ids, uid)
+        row = np.minimum(row, len(self.user_ids) - 1)
+
+        # 기간 밖이거나 사용자 목록을 읽은 뒤 가입한 사용자는 건너뜀
+        keep = (day >= 0) & (day < self.days) & (self.user_ids[row] == uid)
+        flat = row[keep] * self.days + day[keep]
+        size = self.scores.size
+        self.scores += np.bincount(
+            flat, weights=np.asarray(scores, dtype=np.int64)[keep], minlength=size
+        ).astype(np.int64).reshape(self.scores.shape)
+        self.counts += np.bincount(flat, minlength=size).reshape(self.counts.shape)
+
+    @property
+    def dates(self):
+        return [self.start_day + timedelta(days=i) for i in range(self.days)]
+
+    @property
+    def totals(self):
+        return self.scores.sum(axis=1)
+
+    @property
+    def levels(self):
+        """기간 합계 점수 기준 6단계 (감정 리포트와 같은 기준)"""
+        return levels_of(self.totals)
+
+    def summary(self):
+        """코호트 분포: 단계별 인원, 합계 점수 분위수, 일자별 평균"""
+        active = self.counts.sum(axis=1) > 0
+        totals = self.totals[active]
+        level_counts = np.bincount(levels_of(totals), minlength=len(LEVEL_NAMES))
+        daily_active = self.counts > 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            daily_mean = self.scores.sum(axis=0) / daily_active.sum(axis=0)
+        return {
+            "users": int(len(self.user_ids)),
+            "active_users": int(active.sum()),
+            "messages": int(self.counts.sum()),
+            "levels": {
+                name: int(count) for name, count in zip(LEVEL_NAMES, level_counts)
+            },
+            "total_score_percentiles": {
+                p: float(np.percentile(totals, p)) if len(totals) else 0.0
+                for p in (50, 90, 99)
+            },
+            "daily_mean_score": {
+                d.isoformat(): (None if np.isnan(m) else round(float(m), 2))
+                for d, m in zip(self.dates, daily_mean)
+            },
+        }
+
+    def columns(self, usernames):
+        """사용자별 한 줄: 기간 합계/단계 + 날짜별 점수 열"""
+        totals, levels = self.totals, self.levels
+        data = {
+            "user_id": self.user_ids.tolist(),
+            "username": [usernames.get(int(u), "") for u in self.user_ids],
+            "messages": self.counts.sum(axis=1).tolist(),
+            "active_days": (self.counts > 0).sum(axis=1).tolist(),
+            "total_score": totals.tolist(),
+            "level": levels.tolist(),
+            "level_name": [LEVEL_NAMES[level] for level in levels],
+        }
+        for i, d in enumerate(self.dates):
+            data[d.isoformat()] = self.scores[:, i].tolist()
+        return data
+
+
+def write_columns(path, data):
+    """.parquet이면 pyarrow로, 그 외에는 CSV(엑셀에서 한글이 깨지지 않게 BOM 포함)로 저장"""
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet 출력에는 pyarrow가 필요합니다 (pip install pyarrow)")
+        pq.write_table(pa.table(data), path)
+        return
+
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(data.keys())
+        writer.writerows(zip(*data.values()))
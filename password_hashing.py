@@ -0,0 +1,132 @@
+import os, threading, time
+from werkzeug.security import (
+    DEFAULT_PBKDF2_ITERATIONS,
+    check_password_hash,
+    generate_password_hash,
+)
+from metrics import registry
+
+
+# =========================
+# 🔐 비밀번호 해시 전용 풀
+# =========================
+# 비밀번호 해시(pbkdf2/scrypt)는 일부러 수백 ms씩 CPU를 쓰게 만든 연산이라,
+# 요청 그린렛에서 바로 돌리면 gevent 워커 전체가 그동안 멈춘다 (수업 시작에 한 반이
+# 동시에 로그인하면 /chat까지 같이 밀린다). 그래서 해시는 크기가 정해진 전용 풀에서만
+# 돌리고, 풀이 꽉 차면 대기열에서 기다리게 하며, 대기열마저 넘치면 바로 거절한다.
+#
+# hashlib의 pbkdf2_hmac/scrypt는 계산 중에 GIL을 놓기 때문에 프로세스 풀 대신
+# 네이티브 스레드 풀로도 여러 코어를 쓴다 (gevent 워커에서는 gevent.threadpool의 실제 OS 스레드).
+#
+#   PASSWORD_HASH_METHOD     새로 저장할 해시 방식과 비용 (기본 pbkdf2:sha256,
+#                            예: pbkdf2:sha256:600000, scrypt:32768:8:1)
+#   PASSWORD_HASH_WORKERS    동시에 계산하는 해시 수 (기본 2)
+#   PASSWORD_HASH_MAX_QUEUE  풀이 꽉 찼을 때 기다릴 수 있는 요청 수 (기본 32)
+#
+# 로그인에 성공했는데 저장된 해시가 PASSWORD_HASH_METHOD와 다르면 그 자리에서
+# 새 방식으로 다시 해시해서 저장한다 (비용을 올려도 사용자는 알아채지 못함).
+
+hash_queue_wait = registry.histogram(
+    "kirri_password_hash_queue_seconds", "비밀번호 해시 대기열에서 기다린 시간(초)", ("op",)
+)
+hash_duration = registry.histogram(
+    "kirri_password_hash_duration_seconds", "비밀번호 해시 계산 시간(초)", ("op",)
+)
+hash_inflight = registry.gauge(
+    "kirri_password_hash_inflight", "계산 중이거나 대기 중인 비밀번호 해시 수"
+)
+hash_rejected = registry.counter(
+    "kirri_password_hash_rejected_total", "대기열이 넘쳐서 거절한 비밀번호 해시 요청 수", ("op",)
+)
+
+
+class HasherBusy(Exception):
+    """해시 대기열이 가득 차서 요청을 받지 않음 (잠시 후 다시 시도)"""
+
+
+def _method_of(stored_hash):
+    return stored_hash.split("$", 1)[0]
+
+
+def full_method(method):
+    """"pbkdf2:sha256"처럼 비용을 생략한 설정에 werkzeug가 채우는 기본값을 붙인다 (해시 계산 없이)"""
+    name, *args = method.split(":")
+    if name == "scrypt" and not args:
+        return "scrypt:32768:8:1"
+    if name == "pbkdf2" and len(args) < 2:
+        return f"pbkdf2:{args[0] if args else 'sha256'}:{DEFAULT_PBKDF2_ITERATIONS}"
+    return method
+
+
+def _timed(fn, args, queued_at):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, started - queued_at, time.perf_counter() - started
+
+
+class PasswordHasher:
+    def __init__(self, method="pbkdf2:sha256", workers=2, max_queue=32):
+        self.method = method
+        self.workers = workers
+        self.max_queue = max_queue
+        self._pool = None
+        self._target_method = full_method(method)  # "pbkdf2:sha256" → "pbkdf2:sha256:600000"
+        self._inflight = 0
+        self._lock = threading.Lock()
+
+    def hash(self, password):
+        return self._run("hash", generate_password_hash, password, self.method)
+
+    def verify(self, stored_hash, password):
+        return self._run("verify", check_password_hash, stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        """저장된 해시의 방식/비용이 지금 설정과 다른지"""
+        return _method_of(stored_hash) != self._target_method
+
+    def _run(self, op, fn, *args):
+        with self._lock:
+            if self._inflight >= self.workers + self.max_queue:
+                hash_rejected.inc(op=op)
+                raise HasherBusy(f"password hash queue is full ({self._inflight})")
+            self._inflight += 1
+            hash_inflight.set(self._inflight)
+        try:
+            result, waited, took = self._submit(_timed, fn, args, time.perf_counter())
+        finally:
+            with self._lock:
+                self._inflight -= 1
+                hash_inflight.set(self._inflight)
+        hash_queue_wait.observe(waited, op=op)
+        hash_duration.observe(took, op=op)
+        return result
+
+    def _submit(self, fn, *args):
+        # gunicorn이 워커를 fork한 뒤 첫 호출에서 풀을 만든다
+        if self._pool is None:
+            self._pool = _make_pool(self.workers)
+        if hasattr(self._pool, "apply"):
+            return self._pool.apply(fn, args)  # gevent: 이 그린렛만 기다리고 다른 요청은 계속 처리
+        return self._pool.submit(fn, *args).result()
+
+
+def _make_pool(workers):
+    try:
+        from gevent import monkey
+    except ImportError:
+        monkey = None
+    if monkey is not None and monkey.is_module_patched("threading"):
+        # 몽키패치된 threading 스레드는 그린렛이라 계산이 허브를 막으므로 실제 OS 스레드를 쓴다
+        from gevent.threadpool import ThreadPool
+
+        return ThreadPool(workers)
+    from concurrent.futures import ThreadPoolExecutor
+
+    return ThreadPoolExecutor(workers, thread_name_prefix="password-hash")
+
+
+password_hasher = PasswordHasher(
+    method=os.getenv("PASSWORD_HASH_METHOD", "pbkdf2:sha256"),
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+    max_queue=int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32")),
+)
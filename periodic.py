@@ -0,0 +1,70 @@
+import os, threading, time
+
+try:
+    import fcntl
+except ImportError:  # Windows 로컬 개발: 워커가 하나뿐이라 잠금 없이 실행
+    fcntl = None
+
+
+# =========================
+# ⏰ 워커 안에서 도는 주기 작업
+# =========================
+class PeriodicJob:
+    """interval초마다 fn()을 실행하되, 같은 서버의 워커 중 하나만 실행한다.
+
+    워커마다 타이머가 돌지만 lock_path 파일에 flock을 먼저 잡은 워커가 파일에 적힌
+    마지막 실행 시각을 보고, interval이 지났을 때만 실행하고 시각을 갱신한다.
+    서버(인스턴스)가 여러 대면 서로 모르므로 그때는 끄고 cron 하나로 돌린다.
+    """
+
+    def __init__(self, name, fn, interval, lock_path, check_every=300):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.lock_path = lock_path
+        self.check_every = min(check_every, interval) if interval > 0 else check_every
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """처음 부를 때만 백그라운드 스레드를 띄운다 (gunicorn이 워커를 fork한 뒤 첫 요청에서)"""
+        if self._thread is not None or self.interval <= 0:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.check_every)
+            try:
+                self.run_if_due()
+            except Exception as e:
+                print(f"{self.name} 실패: {e}")
+
+    def run_if_due(self):
+        """차례이면 실행하고 True, 다른 워커가 실행 중이거나 아직 때가 아니면 False"""
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        with open(self.lock_path, "a+") as f:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False
+            f.seek(0)
+            try:
+                last_run = float(f.read() or 0)
+            except ValueError:
+                last_run = 0
+            if time.time() - last_run < self.interval:
+                return False
+            try:
+                self.fn()
+            finally:
+                # 실패해도 시각을 남겨서 다음 주기까지는 다시 시도하지 않는다 (장애 중 반복 실행 방지)
+                f.seek(0)
+                f.truncate()
+                f.write(str(time.time()))
+                f.flush()
+            return True
@@ -0,0 +1,62 @@
+import re, unicodedata
+
+
+# =========================
+# 🔎 대화 검색용 글자 바이그램
+# =========================
+# 한국어는 띄어쓰기/조사 때문에 단어 단위 색인이 잘 맞지 않아서 두 글자씩 잘라 색인한다.
+# "오늘 힘들어" → " 오", "오늘", "늘 ", " 힘", "힘들", "들어", "어 "
+# 앞뒤에 공백을 붙여 두면 모든 글자가 어떤 바이그램의 첫 글자가 되므로, 한 글자 검색은
+# 그 글자로 시작하는 바이그램의 범위 조회로 처리할 수 있다.
+#
+# 색인은 후보를 빠르게 좁히는 용도이고, 최종 판단(부분 문자열 포함 여부)과 점수는
+# 후보 메시지 원문으로 다시 계산한다 (바이그램이 다 있어도 순서가 다를 수 있으므로).
+
+MAX_QUERY_LENGTH = 50
+MAX_QUERY_GRAMS = 16  # 아주 긴 검색어는 앞쪽 바이그램만으로 후보를 좁힌다
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text):
+    """전각/반각 통일(NFKC), 소문자, 공백 한 칸으로"""
+    return _SPACES.sub(" ", unicodedata.normalize("NFKC", text or "").lower()).strip()
+
+
+def bigrams(text):
+    """메시지의 바이그램 집합 (색인에 넣을 것)"""
+    padded = f" {normalize(text)} "
+    if len(padded) <= 2:
+        return set()
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def query_terms(query):
+    """검색어 → 공백으로 나눈 검색 단어 목록 (모두 포함해야 일치)"""
+    terms = normalize(query[:MAX_QUERY_LENGTH]).split(" ")
+    return list(dict.fromkeys(term for term in terms if term))
+
+
+def query_grams(terms):
+    """(정확히 일치할 바이그램 목록, 이 글자로 시작하는 바이그램이 있어야 하는 글자 목록)"""
+    exact, prefixes = [], []
+    for term in terms:
+        if len(term) == 1:
+            prefixes.append(term)
+            continue
+        for i in range(len(term) - 1):
+            gram = term[i:i + 2]
+            if gram not in exact:
+                exact.append(gram)
+    return exact[:MAX_QUERY_GRAMS], prefixes
+
+
+def score(message, terms, k1=1.2, b=0.75, avg_length=40):
+    """모든 검색 단어가 들어 있으면 BM25식 점수, 하나라도 없으면 None.
+    검색 단어는 모든 후보에 공통이라 idf는 빼고 단어 빈도와 메시지 길이만 반영한다"""
+    text = normalize(message)
+    counts = {term: text.count(term) for term in terms}
+    if not all(counts.values()):
+        return None
+    norm = k1 * (1 - b + b * len(text) / avg_length)
+    return sum(tf * (k1 + 1) / (tf + norm) for tf in counts.values())
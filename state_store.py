@@ -0,0 +1,147 @@
+import os, json, time, sqlite3, threading
+from collections import OrderedDict
+
+
+# =========================
+# 🗂️ 대화 상태 저장소
+# =========================
+# 대화 요약, PHQ 진행 상황처럼 워커 간에 공유되어야 하는 작은 상태를
+# 담는다. 값은 JSON으로 직렬화 가능한 객체만 저장한다.
+#
+#   STATE_BACKEND      memory | sqlite | redis (기본 memory)
+#   STATE_TTL_SECONDS  마지막 쓰기 이후 보관 시간 (기본 7일)
+#   STATE_MAX_ENTRIES  memory 백엔드의 최대 항목 수 (기본 10000)
+#   STATE_STORE_PATH   sqlite 백엔드 파일 경로 (기본 instance/state.db)
+#   STATE_REDIS_URL    redis 백엔드 주소 (기본 redis://localhost:6379/0)
+
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+class MemoryStateStore:
+    """프로세스 내부 LRU + TTL 저장소 (단일 워커 / 개발용)"""
+
+    def __init__(self, max_entries=10000, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()  # key → (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (ttl or self.ttl)
+        with self._lock:
+            self._data[key] = (expires_at, json.dumps(value))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteStateStore:
+    """여러 gunicorn 워커가 같은 파일을 공유하는 SQLite 저장소"""
+
+    PURGE_EVERY = 500  # 쓰기 N번마다 만료된 항목 정리
+
+    def __init__(self, path, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key, default=None):
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT value FROM state WHERE key = ? AND expires_at >= ?",
+                (key, time.time()),
+            ).fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET "
+                    "value = excluded.value, expires_at = excluded.expires_at",
+                    (key, json.dumps(value), now + (ttl or self.ttl)),
+                )
+                self._writes += 1
+                if self._writes % self.PURGE_EVERY == 0:
+                    conn.execute("DELETE FROM state WHERE expires_at < ?", (now,))
+        finally:
+            conn.close()
+
+    def delete(self, key):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM state WHERE key = ?", (key,))
+        finally:
+            conn.close()
+
+
+class RedisStateStore:
+    """Redis 저장소 (redis 패키지가 설치된 경우에만 사용 가능)"""
+
+    def __init__(self, url, ttl=DEFAULT_TTL, prefix="kirri:"):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key, default=None):
+        value = self._redis.get(self.prefix + key)
+        return json.loads(value) if value is not None else default
+
+    def set(self, key, value, ttl=None):
+        self._redis.set(self.prefix + key, json.dumps(value), ex=int(ttl or self.ttl))
+
+    def delete(self, key):
+        self._redis.delete(self.prefix + key)
+
+
+def create_state_store(backend=None):
+    backend = backend or os.getenv("STATE_BACKEND", "memory")
+    ttl = int(os.getenv("STATE_TTL_SECONDS", DEFAULT_TTL))
+
+    if backend == "memory":
+        return MemoryStateStore(int(os.getenv("STATE_MAX_ENTRIES", "10000")), ttl)
+    if backend == "sqlite":
+        return SQLiteStateStore(os.getenv("STATE_STORE_PATH", "instance/state.db"), ttl)
+    if backend == "redis":
+        return RedisStateStore(
+            os.getenv("STATE_REDIS_URL", "redis://localhost:6379/0"), ttl
+        )
+    raise ValueError(f"알 수 없는 STATE_BACKEND: {backend}")